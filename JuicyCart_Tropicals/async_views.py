@@ -0,0 +1,102 @@
+from functools import wraps
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.http import HttpResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from JuicyCart_Tropicals.readers import row_reader
+from JuicyCart_Tropicals.renderers import FastJSONRenderer
+
+# Helpers for the async read views. They answer with the same bytes as the
+# DRF views they mirror (row readers, FastJSONRenderer, PageNumberPagination
+# links) but query through the async ORM, so under ASGI a request waiting on
+# the database doesn't hold a worker.
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def check_throttles(request, scope):
+    """Seconds to wait by the DEFAULT_THROTTLE_CLASSES buckets, None when the request may go ahead."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    view = SimpleNamespace(throttle_scope=scope)
+    waits = [throttle.wait() for throttle in (cls() for cls in api_settings.DEFAULT_THROTTLE_CLASSES)
+             if not throttle.allow_request(drf_request, view)]
+    return max(waits) if waits else None
+
+
+def throttled(get_scope=lambda request: None):
+    """
+    The buckets DRF views are throttled with, for an async view. `get_scope`
+    names the route scope of a request, as get_throttle_scope() does on a viewset.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            # authenticating may query the database
+            wait = await sync_to_async(check_throttles)(request, get_scope(request)) if settings.THROTTLE_ENABLED else None
+            if wait is not None:
+                exc = Throttled(wait)
+                response = json_response({'detail': str(exc.detail)}, status=exc.status_code)
+                response['Retry-After'] = '%d' % exc.wait
+                return response
+            return await view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _Counted:
+    """Stands in for the queryset so Paginator validates page numbers against an awaited count."""
+
+    def __init__(self, count):
+        self._count = count
+
+    def count(self):
+        return self._count
+
+
+async def read_rows(queryset, serializer_class):
+    reader = row_reader(serializer_class())
+    if reader is None:
+        return await sync_to_async(lambda: serializer_class(list(queryset), many=True).data)()
+    columns, to_dict = reader
+    return [to_dict(row) async for row in queryset.prefetch_related(None).values_list(*columns)]
+
+
+async def list_response(queryset, serializer_class):
+    return json_response(await read_rows(queryset, serializer_class))
+
+
+async def paginated_response(request, queryset, serializer_class, pagination_class):
+    pagination = pagination_class()
+    pagination.request = Request(request)
+    page_size = pagination.get_page_size(pagination.request)
+
+    paginator = Paginator(_Counted(await queryset.acount()), page_size)
+    page_number = pagination.get_page_number(pagination.request, paginator)
+    try:
+        number = paginator.validate_number(page_number)
+    except InvalidPage as exc:
+        message = pagination.invalid_page_message.format(page_number=page_number, message=str(exc))
+        return json_response({'detail': message}, status=404)
+
+    bottom = (number - 1) * page_size
+    pagination.page = Page([], number, paginator)
+    return json_response({
+        'count': paginator.count,
+        'next': pagination.get_next_link(),
+        'previous': pagination.get_previous_link(),
+        'results': await read_rows(queryset[bottom:bottom + page_size], serializer_class),
+    })
+
+
+async def detail_response(queryset, pk, serializer_class):
+    rows = await read_rows(queryset.filter(pk=pk), serializer_class)
+    if not rows:
+        return json_response({'detail': f"No {queryset.model._meta.object_name} matches the given query."}, status=404)
+    return json_response(rows[0])
@@ -0,0 +1,241 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException
+from JuicyCart_Tropicals.metrics import RESPONSE_CACHE_REQUESTS
+from JuicyCart_Tropicals.routers import primary_reads
+from JuicyCart_Tropicals.singleflight import coalesce
+
+# Cached responses remember the version of every tag (e.g. "product:42") they were
+# built from. Invalidating a tag gives it a new version, which turns every entry
+# holding the old one into a miss without having to know which keys those are.
+# A version starts with the time of the invalidation that made it, so a value
+# computed while one of its tags was invalidated is never stored.
+
+# allowance for the clocks of different workers, an invalidation this close to a compute counts as concurrent
+CLOCK_SKEW = 1.0
+
+
+def response_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_response_cache(app_configs, **kwargs):
+    """`manage.py check --deploy` warns about a response cache each worker has its own copy of."""
+    if settings.RESPONSE_CACHE_ENABLED and isinstance(response_cache(), (LocMemCache, DummyCache)):
+        return [checks.Warning(
+            "RESPONSE_CACHE_ENABLED on a local memory cache: an invalidation only reaches the worker that made it, "
+            "the others serve the old response until RESPONSE_CACHE_TIMEOUT.",
+            hint="Point CACHE_URL at redis or memcached, or set RESPONSE_CACHE_ENABLED=false.",
+            id='cache.W001',
+        )]
+    return []
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _new_version(invalidated_at):
+    return f'{invalidated_at:.6f}:{uuid.uuid4().hex}'
+
+
+def _invalidated_at(version):
+    stamp, stamped, _ = version.partition(':')
+    # versions written before they were stamped count as never invalidated
+    return float(stamp) if stamped else 0
+
+
+def invalidated_since(versions, started):
+    """Whether any of `versions` comes from an invalidation after `started` (a time.time())."""
+    return any(_invalidated_at(version) > started - CLOCK_SKEW for version in versions.values())
+
+
+def tag_versions(tags):
+    """Current version of each tag, creating a version for tags that have none yet."""
+    cache = response_cache()
+    keys = {tag: _tag_key(tag) for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for tag, key in keys.items():
+        if key not in found:
+            # a fresh random version (never a counter) so an evicted tag can't reappear with an old value;
+            # stamped 0 since a tag that was never invalidated can't have changed under a compute
+            cache.add(key, _new_version(0), None)
+            found[key] = cache.get(key)
+        versions[tag] = found[key]
+    return versions
+
+
+def invalidate_tags(*tags):
+    def bump():
+        version = _new_version(time.time())
+        response_cache().set_many({_tag_key(tag): version for tag in tags}, None)
+    # only after commit, otherwise a concurrent reader could cache the old rows again
+    transaction.on_commit(bump)
+
+
+def response_cache_key(request):
+    query = '&'.join(f'{k}={v}' for k, values in sorted(request.GET.lists()) for v in sorted(values))
+    raw = f"{request.path}?{query}|{request.headers.get('Accept', '')}"
+    return 'response:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+def get_tagged(key):
+    """(value, is_fresh) for `key`, or (None, False). Entries with an invalidated tag are never returned."""
+    cache = response_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return None, False
+    versions, fresh_until, value = entry
+    current = cache.get_many([_tag_key(tag) for tag in versions])
+    if any(current.get(_tag_key(tag)) != version for tag, version in versions.items()):
+        return None, False
+    return value, time.time() < fresh_until
+
+
+def set_tagged(key, value, versions, timeout):
+    """Store `value` under the tag `versions` it was computed from, see tag_versions()."""
+    # kept past its freshness for RESPONSE_CACHE_STALE_TIMEOUT so it can be served while one worker refreshes it
+    entry = (versions, time.time() + timeout, value)
+    response_cache().set(key, entry, timeout + settings.RESPONSE_CACHE_STALE_TIMEOUT)
+
+
+def get_or_compute(key, compute, timeout):
+    """
+    Cached value for `key`, or the result of compute() -> (value, tags) stored
+    under those tags. Concurrent misses are coalesced so only one caller
+    computes; an entry that merely aged out is served stale meanwhile. Returns
+    (value, result) where result is hit, stale, coalesced or miss.
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return compute()[0], 'miss'
+
+    value, fresh = get_tagged(key)
+    if fresh:
+        return value, 'hit'
+    outcome = {'result': 'stale' if value is not None else 'coalesced'}
+
+    def lookup():
+        found, fresh = get_tagged(key)
+        return found if fresh else None
+
+    def fill():
+        outcome['result'] = 'miss'
+        # taken before computing: the tags are only known afterwards, so their versions are checked against it
+        started = time.time()
+        new, tags = compute()
+        if new is not None:
+            versions = tag_versions(tags)
+            # an invalidation that landed while computing may not be in `new`, storing it would outlive the bump
+            if not invalidated_since(versions, started):
+                set_tagged(key, new, versions, timeout)
+        return new
+
+    return coalesce(key, lookup, fill, stale=value), outcome['result']
+
+
+def response_items(data):
+    """The objects in a response body: a single object, a (possibly paginated) list or an ?ids= batch keyed by id."""
+    if isinstance(data, dict):
+        if 'results' in data:
+            return data['results']
+        if 'id' in data:
+            return [data]
+        # ?ids= batch lookups are keyed by id
+        return list(data.values())
+    return data
+
+
+def instance_tags(model, data):
+    """`model:<id>` for every object in a (possibly paginated) response body, plus `model:list` for lists."""
+    name = model._meta.model_name
+    if isinstance(data, dict) and 'id' in data:
+        return [f"{name}:{data['id']}"]
+    return [f'{name}:list'] + [f"{name}:{item['id']}" for item in response_items(data) if 'id' in item]
+
+
+def invalidate_instance(instance, membership_changed):
+    name = instance._meta.model_name
+    tags = [f'{name}:{instance.pk}']
+    if membership_changed:
+        tags.append(f'{name}:list')
+    invalidate_tags(*tags)
+
+
+class CachedResponseMixin:
+    """
+    Caches JSON GET responses by path and normalized query string. Entries are
+    tagged with the objects they contain and dropped by invalidate_tags(), which
+    the model signals call on save and delete. Object creation and deletion
+    invalidate `<model>:list`; an update only invalidates the objects it touched.
+    A hit never reaches DRF's initial(), so the throttles (and the
+    authentication they need) run before the lookup; responses are the same
+    for every user, these views have no permissions to check.
+    """
+    cache_timeout = None
+
+    def get_cache_tags(self, data):
+        return instance_tags(self.get_queryset().model, data)
+
+    def throttled_response(self, request, *args, **kwargs):
+        """The error response when the throttles turn `request` away, None when it may go ahead."""
+        self.args, self.kwargs = args, kwargs
+        self.request = self.initialize_request(request, *args, **kwargs)
+        self.headers = self.default_response_headers
+        try:
+            self.check_throttles(self.request)
+        except APIException as exc:
+            # Throttled, or AuthenticationFailed from a bad token
+            return self.finalize_response(self.request, self.handle_exception(exc), *args, **kwargs)
+        # a miss goes through initial(), which mustn't count the request again
+        request.throttles_checked = True
+        return None
+
+    def check_throttles(self, request):
+        if not getattr(request._request, 'throttles_checked', False):
+            super().check_throttles(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method != 'GET' or not settings.RESPONSE_CACHE_ENABLED:
+            return super().dispatch(request, *args, **kwargs)
+
+        if settings.THROTTLE_ENABLED:
+            throttled = self.throttled_response(request, *args, **kwargs)
+            if throttled is not None:
+                return throttled
+
+        uncacheable = []
+
+        def compute():
+            # a lagging replica could put old rows in the cache under the new tag versions
+            with primary_reads():
+                response = super(CachedResponseMixin, self).dispatch(request, *args, **kwargs)
+            if response.status_code != 200 or getattr(response, 'accepted_media_type', None) != 'application/json':
+                uncacheable.append(response)
+                return None, None
+            response.render()
+            return (response.content, response['Content-Type'], response.get('Vary')), self.get_cache_tags(response.data)
+
+        timeout = self.cache_timeout or settings.RESPONSE_CACHE_TIMEOUT
+        entry, result = get_or_compute(response_cache_key(request), compute, timeout)
+        view = request.resolver_match.view_name if request.resolver_match else type(self).__name__
+        RESPONSE_CACHE_REQUESTS.labels(view, result).inc()
+        if uncacheable:
+            return uncacheable[0]
+
+        content, content_type, vary = entry
+        response = HttpResponse(content, content_type=content_type)
+        if vary:
+            response['Vary'] = vary
+        response['X-Cache'] = result.upper()
+        return response
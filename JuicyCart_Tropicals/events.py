@@ -0,0 +1,228 @@
+import asyncio
+import collections
+import functools
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+# Events published on channels (e.g. "shop:3", "customer:7") with increasing
+# ids, kept for a while so a client that reconnects with the last id it saw
+# gets what it missed. EVENT_BROKER picks the implementation: LocalBroker keeps
+# them in this process, which is enough for a single worker; CacheBroker goes
+# through the default cache (redis/memcached) so every worker sees them.
+
+Event = collections.namedtuple('Event', 'id type data')
+
+
+class Broker:
+    """Subclasses store events; waiting is done by polling `events` every EVENT_POLL_INTERVAL seconds."""
+
+    def publish(self, channels, event_type, data):
+        raise NotImplementedError
+
+    def last_id(self):
+        raise NotImplementedError
+
+    def events(self, channels, after):
+        """(events on `channels` with an id above `after`, id to continue after)."""
+        raise NotImplementedError
+
+    def wait(self, channels, after, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events, after = self.events(channels, after)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events, after
+            time.sleep(min(settings.EVENT_POLL_INTERVAL, remaining))
+
+    async def await_events(self, channels, after, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            events, after = await sync_to_async(self.events)(channels, after)
+            remaining = deadline - time.monotonic()
+            if events or remaining <= 0:
+                return events, after
+            await asyncio.sleep(min(settings.EVENT_POLL_INTERVAL, remaining))
+
+
+class LocalBroker(Broker):
+    def __init__(self):
+        self._events = collections.deque(maxlen=settings.EVENT_BACKLOG)
+        self._last_id = 0
+        self._condition = threading.Condition()
+        # (loop, asyncio.Event) of async streams waiting for the next event
+        self._async_waiters = set()
+
+    def publish(self, channels, event_type, data):
+        with self._condition:
+            self._last_id += 1
+            event_id = self._last_id
+            self._events.append((event_id, frozenset(channels), event_type, data))
+            self._condition.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # the loop was closed
+                pass
+        return event_id
+
+    def last_id(self):
+        return self._last_id
+
+    def events(self, channels, after):
+        with self._condition:
+            return self._collect(channels, after)
+
+    def _collect(self, channels, after):
+        return [
+            Event(event_id, event_type, data) for event_id, event_channels, event_type, data in self._events
+            if event_id > after and not event_channels.isdisjoint(channels)
+        ], self._last_id
+
+    def wait(self, channels, after, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                events, after = self._collect(channels, after)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events, after
+                self._condition.wait(remaining)
+
+    async def await_events(self, channels, after, timeout):
+        deadline = time.monotonic() + timeout
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        try:
+            while True:
+                with self._condition:
+                    waiter[1].clear()
+                    events, after = self._collect(channels, after)
+                    self._async_waiters.add(waiter)
+                remaining = deadline - time.monotonic()
+                if events or remaining <= 0:
+                    return events, after
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+
+
+class CacheBroker(Broker):
+    """
+    Events under "events:<id>" in the default cache, ids from an atomic incr
+    of "events:last". A publisher writes the event just after taking its id,
+    so a missing event among the newest ones is waited for, an older one is
+    skipped (it expired).
+    """
+    prefix = 'events'
+    in_flight = 10
+
+    @property
+    def cache(self):
+        return caches['default']
+
+    def publish(self, channels, event_type, data):
+        self.cache.add(f'{self.prefix}:last', 0, timeout=None)
+        event_id = self.cache.incr(f'{self.prefix}:last')
+        self.cache.set(f'{self.prefix}:{event_id}', (list(channels), event_type, data), timeout=settings.EVENT_TTL)
+        return event_id
+
+    def last_id(self):
+        return self.cache.get(f'{self.prefix}:last', 0)
+
+    def events(self, channels, after):
+        last = self.last_id()
+        after = max(after, last - settings.EVENT_BACKLOG)
+        ids = range(after + 1, last + 1)
+        found = self.cache.get_many([f'{self.prefix}:{event_id}' for event_id in ids])
+        events = []
+        for event_id in ids:
+            stored = found.get(f'{self.prefix}:{event_id}')
+            if stored is None and event_id > last - self.in_flight:
+                break
+            after = event_id
+            if stored is not None and not set(stored[0]).isdisjoint(channels):
+                events.append(Event(event_id, stored[1], stored[2]))
+        return events, after
+
+
+@functools.cache
+def broker():
+    return import_string(settings.EVENT_BROKER)()
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_broker(app_configs, **kwargs):
+    """`manage.py check --deploy` warns about a broker each worker has its own copy of."""
+    broker_class = import_string(settings.EVENT_BROKER)
+    if issubclass(broker_class, LocalBroker):
+        return [checks.Warning(
+            "EVENT_BROKER is LocalBroker: an event only reaches streams of the worker that published it.",
+            hint="With more than one worker use JuicyCart_Tropicals.events.CacheBroker and a redis/memcached CACHE_URL.",
+            id='events.W001',
+        )]
+    if issubclass(broker_class, CacheBroker) and isinstance(caches['default'], (LocMemCache, DummyCache)):
+        return [checks.Warning(
+            "CacheBroker on a local memory cache: an event only reaches streams of the worker that published it.",
+            hint="Point CACHE_URL at redis or memcached.",
+            id='events.W002',
+        )]
+    return []
+
+
+def server_sent(events):
+    return ''.join(f'id: {event.id}\nevent: {event.type}\ndata: {event.data}\n\n' for event in events)
+
+
+def stream(channels, after):
+    deadline = time.monotonic() + settings.EVENT_STREAM_TIMEOUT
+    # EventSource reconnects this long after the stream ends, sending Last-Event-ID
+    yield 'retry: 2000\n\n'
+    while (remaining := deadline - time.monotonic()) > 0:
+        events, after = broker().wait(channels, after, min(settings.EVENT_HEARTBEAT, remaining))
+        yield server_sent(events) or ': keepalive\n\n'
+
+
+async def astream(channels, after):
+    deadline = time.monotonic() + settings.EVENT_STREAM_TIMEOUT
+    yield 'retry: 2000\n\n'
+    while (remaining := deadline - time.monotonic()) > 0:
+        events, after = await broker().await_events(channels, after, min(settings.EVENT_HEARTBEAT, remaining))
+        yield server_sent(events) or ': keepalive\n\n'
+
+
+def stream_response(request, channels):
+    """
+    A text/event-stream of the events on `channels`, starting after the
+    client's Last-Event-ID (or ?last_event_id=) or with the next event. Under
+    ASGI the stream waits on the event loop, under WSGI it holds a worker
+    thread for up to EVENT_STREAM_TIMEOUT seconds.
+    """
+    last_id = broker().last_id()
+    try:
+        # an id from before a restart of the broker starts over
+        after = min(int(request.headers.get('Last-Event-ID') or request.GET['last_event_id']), last_id)
+    except (KeyError, ValueError):
+        after = last_id
+
+    events = astream(channels, after) if isinstance(request, ASGIRequest) else stream(channels, after)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx and similar proxies would hold the events back otherwise
+    response['X-Accel-Buffering'] = 'no'
+    return response
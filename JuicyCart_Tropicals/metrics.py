@@ -0,0 +1,40 @@
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+# With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py) every worker writes its
+# samples to mmap'd files in that directory and the exposition merges them, so a
+# scrape sees the whole server and not just the worker that answered it.
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', "Request latency by resolved URL name and status.",
+    ['view', 'method', 'status'],
+)
+REQUEST_DB_QUERIES = Histogram(
+    'http_request_db_queries', "SQL queries run per request.",
+    ['view'], buckets=(1, 2, 3, 5, 10, 20, 50, 100, 250),
+)
+REQUEST_DB_TIME = Histogram(
+    'http_request_db_duration_seconds', "Time spent in SQL per request.",
+    ['view'],
+)
+EMAIL_SEND_LATENCY = Histogram(
+    'email_send_duration_seconds', "Time to hand an email to the mail server.",
+    ['template'],
+)
+GATEWAY_LATENCY = Histogram(
+    'payment_gateway_duration_seconds', "SSLCommerz session creation latency.",
+    ['outcome'], buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+RESPONSE_CACHE_REQUESTS = Counter(
+    'response_cache_requests_total', "Response cache lookups, hit ratio is hit / (hit + miss).",
+    ['view', 'result'],
+)
+
+
+def render_metrics():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
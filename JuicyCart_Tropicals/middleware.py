@@ -0,0 +1,340 @@
+import contextvars
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+import hashlib
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.http import parse_etags
+from django.utils.text import compress_sequence, compress_string
+from whitenoise.middleware import WhiteNoiseFileResponse, WhiteNoiseMiddleware
+from JuicyCart_Tropicals.metrics import REQUEST_DB_QUERIES, REQUEST_DB_TIME, REQUEST_LATENCY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_query_stats = contextvars.ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        # sql reaches execute wrappers with %s placeholders, so the raw string is the query template
+        self.templates = Counter()
+
+    def repeated(self, threshold):
+        return [(sql, n) for sql, n in self.templates.items() if n > threshold]
+
+
+class EventLoopMiddlewareMixin(MiddlewareMixin):
+    """
+    For middleware whose hooks only do a little CPU work and never touch the
+    database: under ASGI they run on the event loop instead of hopping to a
+    thread and back like MiddlewareMixin does for every hook.
+    """
+
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'process_request'):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, 'process_response'):
+            response = self.process_response(request, response)
+        return response
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+        stats.templates[sql] += 1
+
+
+class QueryCountMiddleware(MiddlewareMixin):
+    """
+    Counts the SQL queries and DB time of each request, reports them in a
+    Server-Timing header and warns when a view repeats the same query template
+    more than QUERY_REPEAT_THRESHOLD times (usually an N+1). Stays on
+    MiddlewareMixin: connections are per thread, so under ASGI the hooks must
+    run in the thread the request's queries use.
+    """
+
+    def process_request(self, request):
+        for connection in connections.all():
+            if record_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(record_query)
+
+        request.query_stats = QueryStats()
+        request.started_at = time.perf_counter()
+        _query_stats.set(request.query_stats)
+
+    def process_response(self, request, response):
+        stats = getattr(request, 'query_stats', None)
+        if stats is None:
+            return response
+        _query_stats.set(None)
+
+        total = (time.perf_counter() - request.started_at) * 1000
+        response['Server-Timing'] = (
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries", total;dur={total:.1f}'
+        )
+
+        repeated = stats.repeated(settings.QUERY_REPEAT_THRESHOLD)
+        if repeated:
+            view = request.resolver_match.view_name if request.resolver_match else request.path
+            for sql, n in repeated:
+                logger.warning("%s ran the same query %d times: %s", view, n, sql)
+        return response
+
+
+class MetricsMiddleware(EventLoopMiddlewareMixin):
+    """Records request latency and DB usage per resolved URL name for the /metrics/ endpoint."""
+
+    def process_request(self, request):
+        request.metrics_started_at = time.perf_counter()
+
+    def process_response(self, request, response):
+        started = getattr(request, 'metrics_started_at', None)
+        if started is None:
+            return response
+
+        # unresolved paths share one label so scanners can't blow up the series count
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(time.perf_counter() - started)
+
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            REQUEST_DB_QUERIES.labels(view).observe(stats.count)
+            REQUEST_DB_TIME.labels(view).observe(stats.duration)
+        return response
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def brotli_padding(max_random_bytes):
+    """
+    A metadata meta-block (RFC 7932 section 9.2) of 1 to `max_random_bytes`
+    (at most 256) random bytes, which decoders skip. It varies the length of
+    a response like the random gzip file name does, against BREACH.
+    """
+    size = secrets.randbelow(max_random_bytes) + 1
+    # ISLAST=0, MNIBBLES=0, MSKIPBYTES=1, then MSKIPLEN-1 in 8 bits and zero bits to the byte boundary
+    return bytes([0x16 | (((size - 1) & 3) << 6), (size - 1) >> 2]) + os.urandom(size)
+
+
+def brotli_string(content, quality, max_random_bytes):
+    compressor = brotli.Compressor(quality=quality)
+    # a flush ends on a byte boundary, where the padding block can start
+    head = compressor.process(b'') + compressor.flush()
+    return head + brotli_padding(max_random_bytes) + compressor.process(content) + compressor.finish()
+
+
+def brotli_sequence(sequence, quality, max_random_bytes):
+    compressor = brotli.Compressor(quality=quality)
+    yield compressor.process(b'') + compressor.flush() + brotli_padding(max_random_bytes)
+    for chunk in sequence:
+        # flushed per chunk so a streamed response still reaches the client piece by piece
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(EventLoopMiddlewareMixin):
+    """
+    Brotli (when the brotli package is installed) or gzip for responses of a
+    compressible type larger than COMPRESSION_MIN_SIZE bytes, picked from
+    Accept-Encoding by q-value. Streamed responses are compressed chunk by
+    chunk, except event streams which must not be buffered.
+    """
+    compressible_types = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+    # random padding per response, as in Django's GZipMiddleware
+    max_random_bytes = 100
+
+    def choose_encoding(self, request):
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        wildcard = accepted.get('*', 0)
+        for coding in (('br', 'gzip') if brotli else ('gzip',)):
+            if accepted.get(coding, wildcard) > 0:
+                return coding
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or response.status_code in (204, 206, 304):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if not content_type.startswith(self.compressible_types) or content_type == 'text/event-stream':
+            return response
+        if 'no-transform' in response.get('Cache-Control', ''):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = self.choose_encoding(request)
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                return response
+            if coding == 'br':
+                response.streaming_content = brotli_sequence(
+                    response.streaming_content, settings.BROTLI_QUALITY, self.max_random_bytes,
+                )
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, max_random_bytes=self.max_random_bytes)
+            del response.headers['Content-Length']
+        else:
+            if coding == 'br':
+                compressed = brotli_string(response.content, settings.BROTLI_QUALITY, self.max_random_bytes)
+            else:
+                compressed = compress_string(response.content, max_random_bytes=self.max_random_bytes)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # the compressed body is a different representation, a strong ETag must become weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that can sit in an async middleware chain. The stock middleware
+    is sync only, which makes Django run every view below it, async ones
+    included, through a thread under ASGI.
+
+    Also serves the catalog snapshots (listing/snapshots.py) under
+    CATALOG_SNAPSHOT_URL. WhiteNoise indexes its files once at startup, the
+    snapshots are rewritten while the server runs, so they are opened per
+    request and their ETag (a hash of the content) is recomputed only when
+    the file was replaced.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.catalog_root = settings.CATALOG_SNAPSHOT_DIR and os.path.abspath(settings.CATALOG_SNAPSHOT_DIR)
+        self.catalog_prefix = settings.CATALOG_SNAPSHOT_URL
+        # url -> (file version, etag), least recently used first
+        self._catalog_etags = OrderedDict()
+        self._catalog_lock = threading.Lock()
+
+    def catalog_etag(self, url, fp, stat):
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._catalog_lock:
+            cached = self._catalog_etags.get(url)
+            if cached and cached[0] == version:
+                self._catalog_etags.move_to_end(url)
+                return cached[1]
+        etag = f'"{hashlib.sha256(fp.read()).hexdigest()[:32]}"'
+        fp.seek(0)
+        with self._catalog_lock:
+            self._catalog_etags[url] = (version, etag)
+            while len(self._catalog_etags) > 10_000:
+                self._catalog_etags.popitem(last=False)
+        return etag
+
+    def serve_catalog(self, request):
+        url = request.path_info
+        if not self.catalog_root or not url.startswith(self.catalog_prefix) or request.method not in ('GET', 'HEAD'):
+            return None
+        if not self.url_is_canonical(url):
+            return None
+        try:
+            # size and ETag come from the opened file, a snapshot replaced meanwhile can't mix with them
+            fp = open(os.path.join(self.catalog_root, url[len(self.catalog_prefix):]), 'rb')
+        except OSError:
+            return None
+        stat = os.fstat(fp.fileno())
+        etag = self.catalog_etag(url, fp, stat)
+
+        # If-None-Match compares weakly, CompressionMiddleware weakens the ETag of what it compresses
+        previous = [tag.removeprefix('W/') for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+        if etag in previous or '*' in previous:
+            fp.close()
+            response = HttpResponseNotModified()
+        elif request.method == 'HEAD':
+            fp.close()
+            response = HttpResponse(content_type='application/json')
+            response['Content-Length'] = str(stat.st_size)
+        else:
+            response = WhiteNoiseFileResponse(fp, content_type='application/json')
+            response['Content-Length'] = str(stat.st_size)
+        response['ETag'] = etag
+        response['Cache-Control'] = f'max-age={settings.CATALOG_SNAPSHOT_MAX_AGE}, public'
+        return response
+
+    def serve(self, static_file, request):
+        # If-None-Match compares weakly, CompressionMiddleware weakens the ETag of a file without a
+        # precompressed copy, but WhiteNoise only answers 304 to its own ETag verbatim
+        previous = [tag.removeprefix('W/') for tag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))]
+        if static_file.etag in previous or '*' in previous:
+            request.META['HTTP_IF_NONE_MATCH'] = static_file.etag
+        return super().serve(static_file, request)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.serve_catalog(request)
+        if response is not None:
+            return response
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # an open and fstat, cheaper inline than a hop to a thread
+        response = self.serve_catalog(request)
+        if response is not None:
+            return response
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
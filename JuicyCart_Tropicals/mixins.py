@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from JuicyCart_Tropicals.cache import response_items
+from JuicyCart_Tropicals.readers import row_reader
+
+
+class BatchRetrieveMixin:
+    """
+    `?ids=1,2,3` on a list endpoint returns the matching objects keyed by id,
+    fetched with a single IN (...) query.
+    """
+
+    def list(self, request, *args, **kwargs):
+        ids = request.query_params.get('ids')
+        if ids is None:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            ids = {int(i) for i in ids.split(',') if i.strip()}
+        except ValueError:
+            raise ValidationError({"error": "ids must be a comma separated list of integers."})
+        if len(ids) > settings.BATCH_MAX_IDS:
+            raise ValidationError({"error": f"At most {settings.BATCH_MAX_IDS} ids can be requested at once."})
+
+        objects = list(self.filter_queryset(self.get_queryset()).filter(pk__in=ids))
+        serializer = self.get_serializer(objects, many=True)
+        return Response({str(obj.pk): data for obj, data in zip(objects, serializer.data)})
+
+
+class FastListMixin:
+    """
+    Serves the list action from values_list() rows turned into dicts by a
+    generated function (see readers.py) instead of model instances and the
+    serializer. The output is the same; FAST_READ_ENABLED=False turns it off.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = row_reader(self.get_serializer()) if settings.FAST_READ_ENABLED else None
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        columns, to_dict = reader
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list(*columns)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([to_dict(row) for row in page])
+        return Response([to_dict(row) for row in rows])
+
+
+class SparseFieldsMixin:
+    """
+    `?fields=name,price` limits GET responses to those fields (`id` is always
+    kept) and selects only their columns. `?expand=shop` embeds the objects
+    named in `expandable_fields` instead of their ids, joined with
+    select_related (prefetch_related for to-many relations).
+    """
+    expandable_fields = {}
+
+    def _query_list(self, param):
+        value = self.request.query_params.get(param) or ''
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    @cached_property
+    def sparse_fieldset(self):
+        """(fields, expand) from the query string, fields is None when not limited."""
+        if self.request.method != 'GET':
+            return None, []
+        available = self.get_serializer_class()().fields
+        fields, expand = self._query_list('fields'), self._query_list('expand')
+
+        unknown = [name for name in fields if name not in available]
+        if unknown:
+            raise ValidationError({"error": f"Unknown fields: {', '.join(unknown)}."})
+        unknown = [name for name in expand if name not in self.expandable_fields]
+        if unknown:
+            raise ValidationError({"error": f"Can't expand: {', '.join(unknown)}. Expandable: {', '.join(self.expandable_fields)}."})
+
+        if fields:
+            fields = set(fields) | ({'id'} & set(available))
+            expand = [name for name in expand if name in fields]
+        return fields or None, expand
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fields, expand = self.sparse_fieldset
+        target = getattr(serializer, 'child', serializer)
+        for name in expand:
+            target.fields[name] = self.expandable_fields[name](read_only=True)
+        if fields:
+            for name in list(target.fields):
+                if name not in fields:
+                    target.fields.pop(name)
+        return serializer
+
+    def get_cache_tags(self, data):
+        return super().get_cache_tags(data) + self.expanded_cache_tags(data)
+
+    def expanded_cache_tags(self, data):
+        """`model:<id>` of every embedded object, so editing one invalidates the responses it is embedded in."""
+        tags = set()
+        for name in self.sparse_fieldset[1]:
+            opts = self.expandable_fields[name].Meta.model._meta
+            # Seller and Customer are keyed by their user, not an id
+            key = opts.pk.name
+            for item in response_items(data):
+                embedded = item.get(name)
+                for obj in embedded if isinstance(embedded, list) else [embedded]:
+                    if obj and key in obj:
+                        tags.add(f"{opts.model_name}:{obj[key]}")
+        return sorted(tags)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.sparse_fieldset
+        opts = queryset.model._meta
+        for name in expand:
+            relation = opts.get_field(name)
+            if relation.many_to_many or relation.one_to_many:
+                queryset = queryset.prefetch_related(name)
+            else:
+                queryset = queryset.select_related(name)
+
+        if fields:
+            declared = self.get_serializer_class()().fields
+            sources = [declared[name].source for name in fields]
+            concrete = {f.name for f in opts.concrete_fields}
+            # a field computed from anything but its own column needs the whole row
+            if all(source in concrete for source in sources):
+                queryset = queryset.only(*sources)
+        return queryset
@@ -0,0 +1,183 @@
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils.deprecation import MiddlewareMixin
+
+# With PROFILE_DIR set, requests that carry a valid X-Profile header (see
+# profile_token) or fall in the PROFILE_SAMPLE_RATE sample are profiled: a
+# thread samples the request thread's stack every PROFILE_INTERVAL seconds and
+# the SQL queries are timed. Each profile is written as <id>.folded (folded
+# stacks, for flamegraph.pl, speedscope or inferno) and <id>.trace.json (the
+# request and its queries in Chrome trace format, for Perfetto or
+# chrome://tracing). Without PROFILE_DIR the middleware removes itself.
+#
+# Under ASGI an async view runs on the event loop thread, so that thread is
+# sampled for it; its stacks then also hold whatever other requests the loop
+# runs meanwhile. A sync view runs in a thread of its own and is sampled there.
+
+TOKEN_SALT = 'JuicyCart_Tropicals.profiling'
+
+_profile = contextvars.ContextVar('profile', default=None)
+
+
+def profile_token():
+    """A value for the X-Profile header, valid for PROFILE_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def valid_token(value):
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=settings.PROFILE_TOKEN_MAX_AGE) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+@functools.lru_cache(maxsize=4096)
+def frame_name(code):
+    filename = code.co_filename
+    if filename.startswith(str(settings.BASE_DIR)):
+        filename = os.path.relpath(filename, settings.BASE_DIR)
+    else:
+        filename = filename.rpartition('site-packages' + os.sep)[2]
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """Counts the stacks of one thread, sampled every `interval` seconds."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class Profile:
+    """Samples the thread it is created on until finish()."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_INTERVAL)
+        self.sampler.start()
+
+    def finish(self, request, response):
+        duration = time.perf_counter() - self.started
+        self.sampler.stop()
+
+        match = request.resolver_match
+        view = re.sub(r'[^\w.-]+', '_', match.view_name if match else 'unmatched')
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        path = os.path.join(settings.PROFILE_DIR, profile_id)
+
+        with open(f'{path}.folded', 'w') as fp:
+            for stack, count in self.sampler.stacks.most_common():
+                fp.write(f'{stack} {count}\n')
+
+        events = [{
+            'name': f'{request.method} {request.path}', 'cat': 'request', 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': 0, 'dur': round(duration * 1e6), 'args': {'status': response.status_code, 'view': view},
+        }]
+        events += [{
+            'name': sql[:80], 'cat': 'sql', 'ph': 'X', 'pid': 1, 'tid': 1,
+            'ts': round(offset * 1e6), 'dur': round(elapsed * 1e6), 'args': {'sql': sql, 'database': alias},
+        } for alias, offset, elapsed, sql in self.queries]
+        with open(f'{path}.trace.json', 'w') as fp:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fp)
+        return profile_id
+
+
+def record_profile_query(execute, sql, params, many, context):
+    profile = _profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.queries.append((context['connection'].alias, started - profile.started, time.perf_counter() - started, sql))
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    def __init__(self, get_response):
+        if not settings.PROFILE_DIR:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def should_profile(self, request):
+        token = request.META.get('HTTP_X_PROFILE')
+        if token:
+            return valid_token(token)
+        return random.random() < settings.PROFILE_SAMPLE_RATE
+
+    def watch_queries(self):
+        # connections are per thread, this is called on the one that runs the queries
+        for connection in connections.all():
+            if record_profile_query not in connection.execute_wrappers:
+                connection.execute_wrappers.append(record_profile_query)
+
+    def start(self, request):
+        request.profile = Profile()
+        _profile.set(request.profile)
+
+    def process_request(self, request):
+        if not self.should_profile(request):
+            return
+        self.watch_queries()
+        self.start(request)
+
+    async def __acall__(self, request):
+        try:
+            view = resolve(request.path_info, getattr(request, 'urlconf', None)).func
+        except Resolver404:
+            view = None
+        if view is None or not iscoroutinefunction(view):
+            # sync views run in the thread process_request is called on
+            return await super().__acall__(request)
+
+        if self.should_profile(request):
+            # the async ORM queries from this request's sync thread
+            await sync_to_async(self.watch_queries)()
+            self.start(request)
+        response = await self.get_response(request)
+        return await sync_to_async(self.process_response)(request, response)
+
+    def process_response(self, request, response):
+        profile = getattr(request, 'profile', None)
+        if profile is None:
+            return response
+        _profile.set(None)
+        response['X-Profile'] = profile.finish(request, response)
+        return response
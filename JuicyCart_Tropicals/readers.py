@@ -0,0 +1,122 @@
+import decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
+
+# List endpoints spend most of their CPU building model instances and walking
+# the serializer's field tree for every row. For plain ModelSerializers the
+# output of each field is a simple function of one column, so a list page can
+# be read with values_list() and turned into dicts by a function generated once
+# per serializer class and set of fields. Anything that isn't that simple
+# (nested serializers, method fields, dotted sources, custom formats) makes
+# row_reader() return None and the view keeps using the serializer.
+
+_readers = {}
+
+# fields whose representation of a non-null database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+)
+
+
+def _decimal(field):
+    if getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING) is False or field.localize or field.normalize_output:
+        return None
+    if field.decimal_places is None:
+        return '{:f}'.format
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        return '{:f}'.format(value.quantize(exponent, rounding=rounding, context=context))
+    return convert
+
+
+def _datetime(field):
+    if str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() != ISO_8601:
+        return None
+    enforce_timezone = field.enforce_timezone
+
+    def convert(value):
+        value = enforce_timezone(value).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _date(field):
+    if str(getattr(field, 'format', api_settings.DATE_FORMAT)).lower() != ISO_8601:
+        return None
+    return lambda value: value.isoformat()
+
+
+def _converter(field):
+    """(needs_conversion, converter) for one serializer field, or None when it can't be read from a column."""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return (False, None) if field.pk_field is None else None
+    if isinstance(field, serializers.ChoiceField):
+        # to_representation maps the stored value through the choices, which is a no-op for plain string choices
+        if all(isinstance(key, str) and key == value for key, value in field.choice_strings_to_values.items()):
+            return False, None
+        return None
+    if isinstance(field, PASSTHROUGH_FIELDS) and type(field).to_representation in {
+        serializers.IntegerField.to_representation, serializers.CharField.to_representation,
+        serializers.BooleanField.to_representation,
+    }:
+        return False, None
+    if type(field) is serializers.DecimalField:
+        convert = _decimal(field)
+    elif type(field) is serializers.DateTimeField:
+        convert = _datetime(field)
+    elif type(field) is serializers.DateField:
+        convert = _date(field)
+    else:
+        return None
+    return (True, convert) if convert else None
+
+
+def _build(serializer, fields):
+    serializer_class = type(serializer)
+    if serializer_class.to_representation is not serializers.Serializer.to_representation:
+        return None
+    model = serializer.Meta.model
+    columns, entries, namespace = [], [], {}
+    for field in fields:
+        if not field.source or '.' in field.source or field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            return None
+        converter = _converter(field)
+        if converter is None:
+            return None
+
+        index = len(columns)
+        columns.append(model_field.attname)
+        needs_conversion, convert = converter
+        if needs_conversion:
+            namespace[f'_c{index}'] = convert
+            value = f'(None if row[{index}] is None else _c{index}(row[{index}]))'
+        else:
+            value = f'row[{index}]'
+        entries.append(f'{field.field_name!r}: {value}')
+
+    source = 'def to_dict(row):\n    return {' + ', '.join(entries) + '}\n'
+    exec(compile(source, f'<row reader for {serializer_class.__name__}>', 'exec'), namespace)
+    return columns, namespace['to_dict']
+
+
+def row_reader(serializer):
+    """(columns, to_dict) reproducing the output of `serializer` from a values_list() row, or None."""
+    fields = list(serializer._readable_fields)
+    # ?fields= and ?expand= change the field set, so readers are per class and field layout
+    key = (type(serializer), tuple((field.field_name, type(field)) for field in fields))
+    if key not in _readers:
+        _readers[key] = _build(serializer, fields)
+    return _readers[key]
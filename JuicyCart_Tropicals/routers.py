@@ -0,0 +1,112 @@
+import contextlib
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+from JuicyCart_Tropicals.middleware import EventLoopMiddlewareMixin
+
+# ReplicaMiddleware marks GET/HEAD/OPTIONS requests as read only; the router
+# then sends their reads to a replica, chosen once per request among the ones
+# that answered recently. A write pins the rest of the request to the primary,
+# and a cookie keeps the client there for REPLICA_PIN_SECONDS, so it reads its
+# own writes while the replicas catch up.
+
+PIN_COOKIE = 'use_primary'
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+_chosen = contextvars.ContextVar('replica', default=None)
+_wrote = contextvars.ContextVar('wrote', default=False)
+
+# alias -> monotonic time until which the replica is skipped
+_down_until = {}
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASE_REPLICAS if alias in settings.DATABASES]
+
+
+def mark_down(alias):
+    _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_AFTER
+
+
+def is_healthy(alias):
+    if _down_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_down(alias)
+        return False
+    return True
+
+
+def pin_to_primary():
+    _use_replica.set(False)
+    _wrote.set(True)
+
+
+@contextlib.contextmanager
+def primary_reads():
+    """Read from the primary inside the block, without pinning the rest of the request."""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+@contextlib.contextmanager
+def replica_reads(request):
+    """Let reads inside the block go to a replica as for a GET, unless this request or client must see its writes."""
+    token = _use_replica.set(PIN_COOKIE not in request.COOKIES and not _wrote.get())
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get():
+            return 'default'
+        alias = _chosen.get()
+        if alias is None:
+            candidates = replica_aliases()
+            random.shuffle(candidates)
+            alias = next((a for a in candidates if is_healthy(a)), 'default')
+            _chosen.set(alias)
+        return alias
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware(EventLoopMiddlewareMixin):
+    def process_request(self, request):
+        read_only = request.method in ('GET', 'HEAD', 'OPTIONS') and PIN_COOKIE not in request.COOKIES
+        request._replica_routed = True
+        _use_replica.set(read_only)
+        _chosen.set(None)
+        _wrote.set(False)
+
+    def process_response(self, request, response):
+        if not getattr(request, '_replica_routed', False):
+            return response
+        if _wrote.get() and settings.REPLICA_PIN_SECONDS and replica_aliases():
+            # the replicas may lag behind this write, keep the client's next reads on the primary
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        # set rather than reset with tokens: under ASGI the two hooks run in different contexts
+        _use_replica.set(False)
+        _chosen.set(None)
+        _wrote.set(False)
+        return response
@@ -0,0 +1,75 @@
+import os
+import threading
+import time
+import uuid
+import weakref
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Threads of one process queue on a per-key lock, workers of different processes
+# on a short-lived lock key in the shared cache (cache.add is atomic there). With
+# the local-memory cache the second part degrades to a per-process lock.
+
+
+class _KeyLock:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+_local_locks = weakref.WeakValueDictionary()
+_local_locks_guard = threading.Lock()
+
+
+def _local_lock(key):
+    with _local_locks_guard:
+        lock = _local_locks.get(key)
+        if lock is None:
+            lock = _local_locks[key] = _KeyLock()
+        return lock
+
+
+class Flight:
+    def __init__(self, key):
+        self.key = f'flight:{key}'
+        self.token = f'{os.getpid()}:{uuid.uuid4().hex}'
+        self.cache = caches[settings.RESPONSE_CACHE_ALIAS]
+        self.local = _local_lock(key)
+
+    def acquire(self, blocking=True):
+        wait = settings.SINGLE_FLIGHT_WAIT
+        if not self.local.lock.acquire(blocking, wait if blocking else -1):
+            return False
+
+        deadline = time.monotonic() + wait
+        while not self.cache.add(self.key, self.token, settings.SINGLE_FLIGHT_LOCK_TIMEOUT):
+            if not blocking or time.monotonic() > deadline:
+                self.local.lock.release()
+                return False
+            time.sleep(0.02)
+        return True
+
+    def release(self):
+        if self.cache.get(self.key) == self.token:
+            self.cache.delete(self.key)
+        self.local.lock.release()
+
+
+def coalesce(key, lookup, compute, stale=None):
+    """
+    Run compute() for `key` in at most one thread and one worker at a time.
+
+    Callers that lose the race either get `stale` straight away, when there is
+    one, or wait for the winner and return what lookup() then finds. compute()
+    still runs if the winner takes longer than SINGLE_FLIGHT_WAIT.
+    """
+    flight = Flight(key)
+    if flight.acquire(blocking=stale is None):
+        try:
+            value = lookup()
+            return value if value is not None else compute()
+        finally:
+            flight.release()
+    if stale is not None:
+        return stale
+    return compute()
@@ -0,0 +1,101 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import CaptureQueriesContext
+from JuicyCart_Tropicals.cache import response_cache
+
+from listing.models import Category, Product, Review
+from order.models import Order
+from shop.models import Shop
+from users.models import Customer, Seller
+
+
+class TestRunner(DiscoverRunner):
+    """Settings every test starts from, whatever the environment configures; tests override them as needed."""
+
+    test_settings = {
+        # tests run inside a transaction the replica connections can't see into, so they read from default
+        'DATABASE_REPLICAS': [],
+        # tests send far more requests than a client would, throttling is turned on per test
+        'THROTTLE_ENABLED': False,
+    }
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**self.test_settings)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
+
+
+def create_marketplace(products=5, orders=5):
+    """A seller with a shop of `products` products, and a customer who ordered and reviewed them."""
+    seller_user = User.objects.create_user('seller', email='seller@example.com', password='seller-password')
+    seller = Seller.objects.create(user=seller_user, mobile_no='01700000000', full_address='Rajshahi')
+    shop = Shop.objects.create(owner=seller, name='Mango House', description='Fresh mangoes', location='Rajshahi')
+    category = Category.objects.create(name='Himsagar')
+
+    customer_user = User.objects.create_user('customer', email='customer@example.com', password='customer-password')
+    customer = Customer.objects.create(user=customer_user, full_address='Dhaka')
+
+    items = [
+        Product.objects.create(
+            shop=shop, category=category, name=f'Mango {i}', price=Decimal('120.50'), available=100, sold=10, about='Sweet and juicy',
+        )
+        for i in range(products)
+    ]
+    for i in range(orders):
+        product = items[i % len(items)]
+        Order.objects.create(product=product, customer=customer, quantity=2, total_price=product.price * 2)
+        Review.objects.create(user=customer, product=product, rating=5, content='Great')
+
+    return {
+        'seller': seller, 'shop': shop, 'category': category,
+        'customer': customer, 'products': items,
+    }
+
+
+class QueryBudgetMixin:
+    """Fails a test when a request runs more SQL queries than its budget."""
+
+    def setUp(self):
+        super().setUp()
+        # budgets are for cold requests, not cached responses left over from another test
+        response_cache().clear()
+
+    def assertQueryBudget(self, budget, method, path, data=None, **extra):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, data, **extra)
+        self.assertLessEqual(
+            len(queries), budget,
+            f"{method.upper()} {path} ran {len(queries)} queries, budget is {budget}:\n"
+            + "\n".join(q['sql'] for q in queries.captured_queries),
+        )
+        return response
+
+
+class FastReadMixin:
+    """Compares list endpoints served by FastListMixin (or the async views) with the serializer output."""
+
+    def assertFastReadMatches(self, path, data=None):
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            with override_settings(FAST_READ_ENABLED=False):
+                expected = self.client.get(path, data)
+            actual = self.client.get(path, data)
+        self.assertEqual(expected.status_code, 200)
+        self.assertEqual(actual.content, expected.content)
+        return actual
+
+    def assertAsyncMatches(self, path, async_path, data=None):
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            expected = self.client.get(path, data)
+            actual = self.client.get(async_path, data)
+        self.assertEqual(actual.status_code, expected.status_code)
+        # pagination links point at the endpoint that served the page
+        self.assertEqual(actual.content.replace(async_path.encode(), path.encode()), expected.content)
+        return actual
@@ -0,0 +1,420 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from whitenoise.responders import StaticFile
+from JuicyCart_Tropicals.cache import (
+    check_response_cache, get_or_compute, invalidate_tags, response_cache, set_tagged, tag_versions,
+)
+from JuicyCart_Tropicals.middleware import QueryCountMiddleware, brotli, brotli_string
+from JuicyCart_Tropicals.profiling import StackSampler, profile_token
+from JuicyCart_Tropicals.renderers import FastJSONRenderer
+from JuicyCart_Tropicals.routers import PIN_COOKIE, ReplicaMiddleware, ReplicaRouter
+from JuicyCart_Tropicals.throttling import TokenBucketThrottle, gcra, local_buckets
+from JuicyCart_Tropicals.testing import create_marketplace
+from listing.models import Product
+from listing.serializers import ProductSerializer
+from listing.views import CategoryViewSet
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheCheckTests(SimpleTestCase):
+    def test_deploy_check_flags_unshared_cache(self):
+        # the default cache is locmem here
+        self.assertEqual([warning.id for warning in check_response_cache(None)], ['cache.W001'])
+        with override_settings(RESPONSE_CACHE_ENABLED=False):
+            self.assertEqual(check_response_cache(None), [])
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        response_cache().clear()
+        self.calls = 0
+
+    def compute(self, value, delay=0.2):
+        def run():
+            self.calls += 1
+            time.sleep(delay)
+            return value, ['flight:test']
+        return run
+
+    def test_concurrent_misses_compute_once(self):
+        barrier, results = threading.Barrier(5), []
+
+        def request():
+            barrier.wait()
+            results.append(get_or_compute('flight-test', self.compute('fresh'), 60))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results), [('fresh', 'coalesced')] * 4 + [('fresh', 'miss')])
+
+    def test_stale_entry_is_served_while_one_caller_refreshes(self):
+        # fresh for no time at all, kept for RESPONSE_CACHE_STALE_TIMEOUT
+        set_tagged('flight-test', 'old', tag_versions(['flight:test']), 0)
+        refresher = threading.Thread(target=get_or_compute, args=('flight-test', self.compute('new', delay=0.5), 60))
+        refresher.start()
+        time.sleep(0.1)
+        self.assertEqual(get_or_compute('flight-test', self.compute('other'), 60), ('old', 'stale'))
+        refresher.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(get_or_compute('flight-test', self.compute('other'), 60), ('new', 'hit'))
+
+    def test_value_invalidated_while_computing_is_not_stored(self):
+        def compute():
+            self.calls += 1
+            # outside a transaction the bump happens right away, as if another worker committed meanwhile
+            invalidate_tags('flight:test')
+            return 'racing', ['flight:test']
+
+        self.assertEqual(get_or_compute('flight-test', compute, 60), ('racing', 'miss'))
+        self.assertEqual(get_or_compute('flight-test', compute, 60), ('racing', 'miss'))
+        self.assertEqual(self.calls, 2)
+
+
+class FastJSONTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def test_renderer_matches_drf(self):
+        now = timezone.now()
+        payloads = [
+            ProductSerializer(self.data['products'], many=True).data,
+            {'price': Decimal('120.50'), 'at': now, 'day': now.date(), 1: 'line break', 'name': 'আম'},
+        ]
+        for payload in payloads:
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+
+    def test_parser_reports_errors(self):
+        response = self.client.post('/listing/product/edit/', '{"price": ', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error'))
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200, RESPONSE_CACHE_ENABLED=False)
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def test_gzip_when_accepted(self):
+        response = self.client.get('/listing/products/', HTTP_ACCEPT_ENCODING='gzip;q=1.0, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.content))['results']), len(self.data['products']))
+
+    def test_gzip_is_padded(self):
+        response = self.client.get('/listing/products/', HTTP_ACCEPT_ENCODING='gzip')
+        # the random file name Django adds against BREACH
+        self.assertTrue(response.content[3] & gzip.FNAME)
+
+    @skipUnless(brotli, "Brotli is not installed")
+    def test_brotli_is_padded(self):
+        plain = self.client.get('/listing/products/', HTTP_ACCEPT_ENCODING='identity').content
+        response = self.client.get('/listing/products/', HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain)
+        # every block size a decoder can meet
+        for size in (1, 2, 3, 4, 5, 255, 256):
+            with mock.patch('JuicyCart_Tropicals.middleware.secrets.randbelow', return_value=size - 1):
+                self.assertEqual(brotli.decompress(brotli_string(b'{}', 5, 256)), b'{}')
+
+    def test_identity_when_not_accepted(self):
+        response = self.client.get('/listing/products/', HTTP_ACCEPT_ENCODING='identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.json()['results']), len(self.data['products']))
+
+    def test_small_responses_stay_uncompressed(self):
+        response = self.client.get('/listing/categories/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_weakened_static_etag_is_not_modified(self):
+        url, alternatives = static('admin/css/base.css'), StaticFile.get_alternatives
+        uncompressed = staticmethod(lambda headers, files: alternatives(headers, {None: files[None]}))
+        with mock.patch.object(StaticFile, 'get_alternatives', uncompressed):
+            # no precompressed copy, so the middleware compresses it and weakens its ETag
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+@override_settings(THROTTLE_ENABLED=True, RESPONSE_CACHE_ENABLED=False)
+@mock.patch.object(TokenBucketThrottle, 'THROTTLE_RATES', {'ip': '5/min', 'user': None, 'search': '2/min'})
+class ThrottleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace(products=1, orders=1)
+
+    def setUp(self):
+        local_buckets.clear()
+        self.addCleanup(local_buckets.clear)
+
+    def test_search_has_a_tighter_budget(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/listing/products/', {'name': 'mango'}).status_code, 200)
+        response = self.client.get('/listing/products/', {'name': 'mango'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.client.get('/listing/products/').status_code, 200)
+
+    def test_ip_budget(self):
+        statuses = [self.client.get('/listing/categories/').status_code for _ in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        other = self.client.get('/listing/categories/', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+
+    def test_forwarded_for_is_not_trusted(self):
+        # each request claims another client, the proxy appends the address it saw
+        statuses = [
+            self.client.get('/listing/categories/', HTTP_X_FORWARDED_FOR=f'203.0.113.{i}, 198.51.100.7').status_code
+            for i in range(6)
+        ]
+        self.assertEqual(statuses, [200] * 5 + [429])
+
+    def test_async_views_share_the_buckets(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/listing/products/', {'name': 'mango'}).status_code, 200)
+        response = self.client.get('/listing/async/products/', {'name': 'mango'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(self.client.get('/listing/async/products/').status_code, 200)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_cache_hits_are_throttled(self):
+        response_cache().clear()
+        self.addCleanup(response_cache().clear)
+        statuses = [self.client.get('/listing/products/', {'name': 'mango'}) for _ in range(3)]
+        self.assertEqual([response.status_code for response in statuses], [200, 200, 429])
+        self.assertEqual(statuses[1]['X-Cache'], 'HIT')
+        self.assertEqual(statuses[2]['Retry-After'], '30')
+
+    def test_bucket_refills(self):
+        tat, wait = gcra(None, 2, 60, now=0)
+        tat, wait = gcra(tat, 2, 60, now=0)
+        self.assertEqual(gcra(tat, 2, 60, now=0), (None, 30))
+        self.assertEqual(gcra(tat, 2, 60, now=30)[1], 0)
+
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def test_sub_requests_match_direct_requests(self):
+        user_id = self.data['customer'].user_id
+        paths = [
+            f'/user/list/?user_id={user_id}',
+            f'/order/list/?customer_id={user_id}',
+            f'/listing/products/{self.data["products"][0].id}/',
+            '/listing/products/?page=2&page_size=2',
+            '/listing/async/categories/',
+            '/nowhere/',
+        ]
+        response = self.client.post('/batch/', {'requests': paths}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        responses = response.json()['responses']
+        self.assertEqual([r['path'] for r in responses], paths)
+        self.assertEqual([r['status'] for r in responses], [200, 200, 200, 200, 200, 404])
+        for path, item in zip(paths[:5], responses):
+            self.assertEqual(item['body'], self.client.get(path).json())
+
+    def test_failing_sub_request(self):
+        client = Client(raise_request_exception=False)
+        paths = ['/listing/categories/', '/user/list/']
+        with mock.patch.object(CategoryViewSet, 'list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.request', 'ERROR'):
+            response = client.post('/batch/', {'requests': paths}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        responses = response.json()['responses']
+        self.assertEqual([r['status'] for r in responses], [500, 200])
+        self.assertEqual(responses[0]['body'], {'detail': 'Internal Server Error'})
+
+    def test_limits(self):
+        too_many = ['/listing/categories/'] * (settings.BATCH_MAX_REQUESTS + 1)
+        self.assertEqual(self.client.post('/batch/', {'requests': too_many}, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post('/batch/', {'requests': 'listing'}, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.post('/batch/', ['/listing/categories/'], content_type='application/json').status_code, 400)
+        nested = self.client.post('/batch/', {'requests': ['/batch/']}, content_type='application/json')
+        self.assertEqual(nested.json()['responses'][0]['status'], 400)
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace(products=1, orders=0)
+
+    def test_latency_by_url_name(self):
+        self.client.get('/listing/categories/')
+        self.client.get('/nowhere/')
+        body = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="category-list"}', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="404",view="unmatched"}', body)
+        self.assertIn('http_request_db_queries_count{view="category-list"}', body)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_no_token_is_open_only_in_debug(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+
+@override_settings(QUERY_REPEAT_THRESHOLD=3)
+class QueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def run_view(self, view):
+        request = RequestFactory().get('/listing/products/')
+        middleware = QueryCountMiddleware(view)
+        middleware.process_request(request)
+        return middleware.process_response(request, view(request))
+
+    def test_server_timing_counts_queries(self):
+        response = self.run_view(lambda request: HttpResponse(str(Product.objects.count())))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 queries", total;dur=[\d.]+$')
+
+    def test_repeated_query_warns(self):
+        def n_plus_one(request):
+            return HttpResponse(','.join(product.shop.name for product in Product.objects.all()))
+
+        with self.assertLogs('JuicyCart_Tropicals.middleware', 'WARNING') as logs:
+            response = self.run_view(n_plus_one)
+        self.assertIn('desc="6 queries"', response['Server-Timing'])
+        [message] = logs.output
+        self.assertIn('ran the same query 5 times', message)
+        self.assertIn('shop_shop', message)
+
+    def test_few_repeats_stay_quiet(self):
+        with self.assertNoLogs('JuicyCart_Tropicals.middleware', 'WARNING'):
+            self.run_view(lambda request: HttpResponse(','.join(p.shop.name for p in Product.objects.all()[:3])))
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        settings_override = override_settings(PROFILE_DIR=self.profile_dir, RESPONSE_CACHE_ENABLED=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_signed_header_writes_profile(self):
+        response = self.client.get('/listing/products/', HTTP_X_PROFILE=profile_token())
+        profile_id = response['X-Profile']
+        self.assertIn('product-list', profile_id)
+        self.assertTrue(os.path.exists(os.path.join(self.profile_dir, f'{profile_id}.folded')))
+
+        with open(os.path.join(self.profile_dir, f'{profile_id}.trace.json')) as fp:
+            events = json.load(fp)['traceEvents']
+        self.assertEqual(events[0]['args']['status'], 200)
+        self.assertTrue(any(event['cat'] == 'sql' and 'listing_product' in event['args']['sql'] for event in events))
+
+    async def test_async_view_samples_the_event_loop_thread(self):
+        samplers = []
+
+        def sampler(*args):
+            samplers.append(StackSampler(*args))
+            return samplers[-1]
+
+        with mock.patch('JuicyCart_Tropicals.profiling.StackSampler', side_effect=sampler):
+            response = await self.async_client.get('/listing/async/categories/', headers={'X-Profile': profile_token()})
+        self.assertIn('async_category_list', response['X-Profile'])
+        self.assertEqual([s.thread_id for s in samplers], [threading.get_ident()])
+
+        with open(os.path.join(self.profile_dir, f"{response['X-Profile']}.trace.json")) as fp:
+            events = json.load(fp)['traceEvents']
+        self.assertTrue(any(event['cat'] == 'sql' and 'listing_category' in event['args']['sql'] for event in events))
+
+    def test_other_requests_are_not_profiled(self):
+        self.assertFalse(self.client.get('/listing/products/', HTTP_X_PROFILE='forged').has_header('X-Profile'))
+        self.assertFalse(self.client.get('/listing/products/').has_header('X-Profile'))
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+
+@mock.patch('JuicyCart_Tropicals.routers.replica_aliases', return_value=['replica1'])
+class ReplicaRouterTests(TestCase):
+    def route(self, method, cookies=None, healthy=True, write=False):
+        request = getattr(RequestFactory(), method)('/listing/products/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaMiddleware(lambda request: None)
+        middleware.process_request(request)
+        with mock.patch('JuicyCart_Tropicals.routers.is_healthy', return_value=healthy):
+            router = ReplicaRouter()
+            if write:
+                router.db_for_write(Product)
+            alias = router.db_for_read(Product)
+        response = middleware.process_response(request, HttpResponse())
+        return alias, response
+
+    def test_get_reads_from_replica(self, aliases):
+        alias, response = self.route('get')
+        self.assertEqual(alias, 'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_post_reads_from_primary(self, aliases):
+        self.assertEqual(self.route('post')[0], 'default')
+
+    def test_unhealthy_replica_falls_back_to_primary(self, aliases):
+        self.assertEqual(self.route('get', healthy=False)[0], 'default')
+
+    def test_write_pins_request_and_client(self, aliases):
+        alias, response = self.route('get', write=True)
+        self.assertEqual(alias, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.route('get', cookies={PIN_COOKIE: '1'})[0], 'default')
+
+
+REPLICA_ALIASES = [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+@skipUnless(REPLICA_ALIASES, "needs DATABASE_REPLICA_URLS")
+@override_settings(DATABASE_REPLICAS=REPLICA_ALIASES, RESPONSE_CACHE_ENABLED=False)
+class ReplicaReadTests(TransactionTestCase):
+    # committed rows, the replica connections can't see inside TestCase's transaction
+    databases = '__all__'
+
+    def setUp(self):
+        self.data = create_marketplace(products=1, orders=1)
+
+    def test_get_reads_from_replica(self):
+        with CaptureQueriesContext(connection) as primary:
+            response = self.client.get('/order/list/')
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(primary), 0)
+
+    def test_post_reads_from_primary(self):
+        with CaptureQueriesContext(connections[REPLICA_ALIASES[0]]) as replica:
+            self.client.post('/shop/dashboard/', {'user_id': self.data['seller'].user_id})
+        self.assertEqual(len(replica), 0)
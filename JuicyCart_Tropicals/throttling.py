@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+# Token buckets kept as a single "theoretical arrival time" per key (GCRA):
+# a rate of N/period is a bucket of N tokens refilled over the period, so a
+# client can burst N requests and then gets one every period/N. Each worker
+# checks its own buckets first, which is enough to turn away a client
+# hammering that worker without any I/O. With THROTTLE_CACHE set the requests
+# that pass are also counted in that cache, shared by all workers. The cache
+# update is a get then a set, so concurrent workers can let a few extra
+# requests through, never fewer.
+
+
+def gcra(tat, capacity, period, now):
+    """(new arrival time, 0) when a request at `now` fits the bucket, (None, seconds to wait) otherwise."""
+    interval = period / capacity
+    tat = max(tat or now, now) + interval
+    allowed_at = tat - period
+    if allowed_at > now:
+        return None, allowed_at - now
+    return tat, 0
+
+
+class LocalBuckets:
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._tats = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, period, now):
+        with self._lock:
+            tat, wait = gcra(self._tats.get(key), capacity, period, now)
+            if tat is not None:
+                self._tats[key] = tat
+                self._tats.move_to_end(key)
+                # least recently used first, an evicted key just starts with a full bucket
+                while len(self._tats) > self.max_keys:
+                    self._tats.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+
+def consume_shared(cache, key, capacity, period, now):
+    tat, wait = gcra(cache.get(key), capacity, period, now)
+    if tat is not None:
+        cache.set(key, tat, timeout=math.ceil(tat - now))
+    return wait
+
+
+local_buckets = LocalBuckets(max_keys=10_000)
+
+
+def consume(key, capacity, period):
+    """Seconds until `key` may make a request, 0 when it may now."""
+    now = time.time()
+    wait = local_buckets.consume(key, capacity, period, now)
+    if wait or not settings.THROTTLE_CACHE:
+        return wait
+    return consume_shared(caches[settings.THROTTLE_CACHE], key, capacity, period, now)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle's rates and keys, counted with token buckets instead of a request history."""
+
+    def allow_request(self, request, view):
+        self.seconds = 0
+        if not settings.THROTTLE_ENABLED or self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        self.seconds = consume(key, self.num_requests, self.duration)
+        return self.seconds == 0
+
+    def wait(self):
+        return self.seconds
+
+
+class IPBucketThrottle(TokenBucketThrottle):
+    scope = 'ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class UserBucketThrottle(TokenBucketThrottle):
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': request.user.pk}
+
+
+class RouteBucketThrottle(TokenBucketThrottle):
+    """
+    A bucket per client for views that name a scope, with `throttle_scope` or
+    `get_throttle_scope()` (for a scope that depends on the action or query).
+    """
+
+    def __init__(self):
+        # the rate depends on the view, see allow_request
+        pass
+
+    def allow_request(self, request, view):
+        if hasattr(view, 'get_throttle_scope'):
+            self.scope = view.get_throttle_scope()
+        else:
+            self.scope = getattr(view, 'throttle_scope', None)
+        if not self.scope:
+            self.seconds = 0
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user{request.user.pk}'
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
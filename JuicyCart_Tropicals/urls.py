@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from JuicyCart_Tropicals.views import BatchAPIView, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -25,6 +26,8 @@ urlpatterns = [
     path('listing/', include('listing.urls')),
     path('shop/', include('shop.urls')),
     path('order/', include('order.urls')),
+    path('metrics/', metrics, name='metrics'),
+    path('batch/', BatchAPIView.as_view(), name='batch'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
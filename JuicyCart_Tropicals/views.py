@@ -0,0 +1,93 @@
+import json
+from http import HTTPStatus
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.http import Http404, HttpRequest, HttpResponse, HttpResponseForbidden, QueryDict
+from django.urls import Resolver404, resolve
+from prometheus_client import CONTENT_TYPE_LATEST
+from rest_framework import views
+from rest_framework.exceptions import ValidationError
+from JuicyCart_Tropicals.metrics import render_metrics
+from JuicyCart_Tropicals.routers import replica_reads
+
+
+def metrics(request):
+    if not settings.METRICS_TOKEN:
+        # open only in development, a deployment without a token doesn't expose its traffic
+        if not settings.DEBUG:
+            raise Http404
+    elif request.headers.get('Authorization') != f"Bearer {settings.METRICS_TOKEN}":
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
+
+
+class BatchAPIView(views.APIView):
+    """
+    POST {"requests": ["/user/list/?user_id=1", "/order/list/?customer_id=1"]}
+    runs the GETs in this process, as the user this request authenticated as,
+    and answers {"responses": [{"path": ..., "status": ..., "body": ...}]} in
+    the same order. JSON bodies are spliced in as rendered, not parsed again.
+    """
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            raise ValidationError({"error": "Expected a JSON object with a requests list."})
+        paths = request.data.get('requests')
+        if not isinstance(paths, list) or not all(isinstance(path, str) and path.startswith('/') for path in paths):
+            raise ValidationError({"error": "requests must be a list of paths starting with /."})
+        if len(paths) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError({"error": f"At most {settings.BATCH_MAX_REQUESTS} requests can be batched."})
+
+        parts = []
+        with replica_reads(request):
+            for path in paths:
+                status, body = self.run(request, path)
+                parts.append(b'{"path":%s,"status":%d,"body":%s}' % (json.dumps(path).encode(), status, body))
+        return HttpResponse(b'{"responses":[%s]}' % b','.join(parts), content_type='application/json')
+
+    def run(self, request, path):
+        url = urlsplit(path)
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return 404, b'{"detail":"Not found."}'
+        if match.url_name == 'batch':
+            return 400, b'{"detail":"Batches can\'t be nested."}'
+
+        sub_request = HttpRequest()
+        sub_request.method = 'GET'
+        sub_request.path = sub_request.path_info = url.path
+        sub_request.META = {**request.META, 'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query}
+        sub_request.META.pop('CONTENT_LENGTH', None)
+        sub_request.META.pop('CONTENT_TYPE', None)
+        sub_request.GET = QueryDict(url.query)
+        sub_request.COOKIES = request.COOKIES
+        sub_request.resolver_match = match
+        # authentication already ran for the batch, DRF views take the result as is
+        sub_request.user = request.user
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+
+        view = match.func
+        if iscoroutinefunction(view):
+            # the async views, run to completion here as the batch itself is sync
+            view = async_to_sync(view)
+        try:
+            response = view(sub_request, *match.args, **match.kwargs)
+        except Http404:
+            return 404, b'{"detail":"Not found."}'
+        except Exception as exc:
+            # the status Django would answer the request alone with, logged and signalled the same way;
+            # the other entries of the batch still run
+            status = response_for_exception(sub_request, exc).status_code
+            return status, json.dumps({'detail': HTTPStatus(status).phrase}).encode()
+        if response.streaming:
+            return 400, b'{"detail":"Streamed responses can\'t be batched."}'
+        if hasattr(response, 'render'):
+            response.render()
+        if response.get('Content-Type', '').startswith('application/json'):
+            return response.status_code, response.content
+        return response.status_code, json.dumps(response.content.decode(response.charset, 'replace')).encode()
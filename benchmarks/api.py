@@ -0,0 +1,255 @@
+"""End-to-end API benchmark replaying weighted request mixes against a seeded database.
+
+    python -m benchmarks.api --profile mixed --requests 2000 --output bench.json
+    python -m benchmarks.api --profile browse --compare bench.json
+
+Profiles: browse, reviews, checkout, dashboard, orders, mixed, or a JSON lines
+file given with --profile-file where each line is
+{"method": "get", "path": "/listing/products/?page=2", "data": {...}, "weight": 3}.
+The SSLCommerz gateway is replaced by a local stub so checkout never leaves the box.
+"""
+import argparse
+import json
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from decimal import Decimal
+from unittest import mock
+
+from benchmarks.utils import setup, test_database, write_results
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class StubGateway:
+    def __init__(self, settings):
+        pass
+
+    def createSession(self, post_body):
+        return {'status': 'SUCCESS', 'GatewayPageURL': f"https://sandbox.invalid/pay/{post_body['tran_id']}"}
+
+
+def seed(rng, shops=5, products=200, customers=50, orders=1000, reviews=500):
+    from django.contrib.auth.models import User
+    from listing.models import Category, Product, Review
+    from order.models import Order
+    from shop.models import Shop
+    from users.models import Customer, Seller
+
+    categories = [Category.objects.create(name=name) for name in ('Himsagar', 'Langra', 'Fazli', 'Amrapali', 'Gopalbhog')]
+
+    sellers = []
+    for i in range(shops):
+        user = User.objects.create(username=f'seller{i}', email=f'seller{i}@example.com')
+        sellers.append(Seller.objects.create(user=user, mobile_no='01700000000', full_address='Rajshahi'))
+    shop_list = [
+        Shop.objects.create(owner=seller, name=f'Shop {i}', description='Mangoes', location='Rajshahi')
+        for i, seller in enumerate(sellers)
+    ]
+
+    product_list = Product.objects.bulk_create([
+        Product(
+            shop=rng.choice(shop_list), category=rng.choice(categories), name=f'Mango {i}',
+            price=Decimal(rng.randint(80, 400)), available=10 ** 6, sold=0, about='Sweet and juicy ' * 20,
+        )
+        for i in range(products)
+    ])
+
+    customer_users = User.objects.bulk_create([
+        User(username=f'customer{i}', email=f'customer{i}@example.com') for i in range(customers)
+    ])
+    customer_list = Customer.objects.bulk_create([Customer(user=user, full_address='Dhaka') for user in customer_users])
+
+    statuses = ['Pending', 'Completed', 'Cancelled']
+    Order.objects.bulk_create([
+        Order(
+            product=product, customer=rng.choice(customer_list), quantity=2,
+            total_price=product.price * 2, status=rng.choice(statuses),
+        )
+        for product in rng.choices(product_list, k=orders)
+    ])
+    Review.objects.bulk_create([
+        Review(user=rng.choice(customer_list), product=rng.choice(product_list), rating=rng.randint(1, 5), content='Tasty')
+        for _ in range(reviews)
+    ])
+    return {'categories': categories, 'sellers': sellers, 'shops': shop_list,
+            'products': product_list, 'customers': customer_list}
+
+
+def builtin_profiles(data):
+    categories, shops, products = data['categories'], data['shops'], data['products']
+    customers, sellers = data['customers'], data['sellers']
+
+    def browse(rng):
+        params = rng.choice([
+            {},
+            {'category_id': rng.choice(categories).id},
+            {'shop_id': rng.choice(shops).id},
+            {'name': 'mango 1'},
+            {'min_price': 100, 'max_price': 250},
+            {'page': rng.randint(1, 5)},
+            {'page_size': 100},
+        ])
+        return 'get', '/listing/products/', params
+
+    def product_detail(rng):
+        return 'get', f'/listing/products/{rng.choice(products).id}/', None
+
+    def reviews(rng):
+        return 'get', f'/listing/product/{rng.choice(products).id}/reviews/', None
+
+    def checkout(rng):
+        product, customer = rng.choice(products), rng.choice(customers)
+        if rng.random() < 0.5:
+            return 'post', '/order/payment/create_payment/', {
+                'product_id': product.id, 'user_id': customer.user_id, 'quantity': 1,
+            }
+        return 'post', f'/order/payment/success/?user_id={customer.user_id}&quantity=1&product_id={product.id}', None
+
+    def dashboard(rng):
+        return 'post', '/shop/dashboard/', {'user_id': rng.choice(sellers).user_id}
+
+    def orders(rng):
+        if rng.random() < 0.5:
+            return 'get', '/order/list/', {'customer_id': rng.choice(customers).user_id}
+        return 'get', '/order/list/', {'shop_id': rng.choice(shops).id}
+
+    return {
+        'browse': [(browse, 8), (product_detail, 2)],
+        'reviews': [(reviews, 1)],
+        'checkout': [(checkout, 1)],
+        'dashboard': [(dashboard, 1)],
+        'orders': [(orders, 1)],
+        'mixed': [(browse, 50), (product_detail, 15), (reviews, 15), (orders, 10), (dashboard, 5), (checkout, 5)],
+    }
+
+
+def file_profile(path):
+    entries = []
+    with open(path) as fp:
+        for line in fp:
+            if line.strip():
+                entry = json.loads(line)
+                request = (entry.get('method', 'get').lower(), entry['path'], entry.get('data'))
+                entries.append((lambda rng, request=request: request, entry.get('weight', 1)))
+    return entries
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def replay(client, profile, count, rng):
+    generators, weights = zip(*profile)
+    latencies, queries, statuses = defaultdict(list), defaultdict(list), defaultdict(Counter)
+    started = time.perf_counter()
+    for generator in rng.choices(generators, weights=weights, k=count):
+        method, path, data = generator(rng)
+        request_started = time.perf_counter()
+        response = getattr(client, method)(path, data)
+        elapsed = time.perf_counter() - request_started
+
+        route = response.wsgi_request.resolver_match.view_name if response.wsgi_request.resolver_match else path
+        latencies[route].append(elapsed)
+        statuses[route][response.status_code] += 1
+        match = SERVER_TIMING_QUERIES.search(response.get('Server-Timing', ''))
+        if match:
+            queries[route].append(int(match.group(1)))
+    return time.perf_counter() - started, latencies, queries, statuses
+
+
+def failures(statuses):
+    """{route: {status: count}} of 4xx and 5xx responses, their timings aren't comparable (the payment callbacks redirect)."""
+    failed = {}
+    for route, counts in sorted(statuses.items()):
+        bad = {status: count for status, count in sorted(counts.items()) if status >= 400}
+        if bad:
+            failed[route] = bad
+    return failed
+
+
+def summarize(elapsed, latencies, queries, statuses):
+    def stats(samples, query_counts):
+        ms = [s * 1000 for s in samples]
+        return {
+            'requests': len(ms),
+            'p50_ms': round(percentile(ms, 50), 2),
+            'p95_ms': round(percentile(ms, 95), 2),
+            'p99_ms': round(percentile(ms, 99), 2),
+            'queries_per_request': round(statistics.mean(query_counts), 2) if query_counts else None,
+        }
+
+    all_latencies = [s for samples in latencies.values() for s in samples]
+    all_queries = [q for counts in queries.values() for q in counts]
+    return {
+        'total': {**stats(all_latencies, all_queries), 'throughput_rps': round(len(all_latencies) / elapsed, 1)},
+        'routes': {route: stats(samples, queries[route]) for route, samples in sorted(latencies.items())},
+        'failures': failures(statuses),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous_path, results):
+    with open(previous_path) as fp:
+        previous = json.load(fp)
+    print(f"\ncompared with {previous_path} ({previous.get('revision')}):")
+    for key in ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'queries_per_request'):
+        old, new = previous['summary']['total'].get(key), results['summary']['total'].get(key)
+        if old and new is not None:
+            print(f"  {key:>20}: {old} -> {new} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', default='mixed')
+    parser.add_argument('--profile-file', default=None)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    parser.add_argument('--compare', default=None, help="Previous results file to diff against.")
+    args = parser.parse_args()
+
+    setup()
+    from django.test import Client
+
+    rng = random.Random(args.seed)
+    with test_database(), mock.patch('sslcommerz_lib.SSLCOMMERZ', StubGateway):
+        data = seed(rng, products=args.products, orders=args.orders)
+        profile = file_profile(args.profile_file) if args.profile_file else builtin_profiles(data)[args.profile]
+
+        client = Client()
+        replay(client, profile, args.warmup, rng)
+        elapsed, latencies, queries, statuses = replay(client, profile, args.requests, rng)
+
+    results = {
+        'revision': git_revision(),
+        'profile': args.profile_file or args.profile,
+        'requests': args.requests,
+        'seed': args.seed,
+        'summary': summarize(elapsed, latencies, queries, statuses),
+    }
+    print(json.dumps(results['summary'], indent=2))
+    if args.output:
+        write_results(args.output, results)
+    if args.compare:
+        compare(args.compare, results)
+    if results['summary']['failures']:
+        sys.exit(f"failed responses: {json.dumps(results['summary']['failures'])}")
+
+
+if __name__ == '__main__':
+    main()
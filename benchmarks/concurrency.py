@@ -0,0 +1,167 @@
+"""Throughput and latency of the read endpoints under concurrent clients: the
+DRF views behind gunicorn's sync workers (the WSGI deployment) vs their async
+twins behind uvicorn workers (ASGI).
+
+    python -m benchmarks.concurrency --workers 2 --concurrency 1,10,50,200 --duration 10
+
+Both servers get the same number of workers and serve the same seeded test
+database, with the response cache off so every request reaches the ORM.
+Needs gunicorn and uvicorn (pip install gunicorn "uvicorn[standard]"). ASGI
+only pays off when requests wait on the database: against a local database
+the thread hops of the async ORM and of sync middleware cost more than they
+save.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks.api import percentile
+from benchmarks.utils import setup, test_database, write_results
+
+SERVERS = {
+    'wsgi': {'args': ['JuicyCart_Tropicals.wsgi:application'], 'prefix': '', 'env': {}},
+    # every ASGI request runs its queries in a new thread, so persistent connections would pile up (DB_POOL instead)
+    'asgi': {'args': ['JuicyCart_Tropicals.asgi:application', '--worker-class', 'uvicorn.workers.UvicornWorker'],
+             'prefix': 'async/', 'env': {'CONN_MAX_AGE': '0'}},
+}
+
+
+def read_paths(prefix, data):
+    """The hot reads; `prefix` is '' for the DRF views and 'async/' for their async twins."""
+    paths = [f'/listing/{prefix}categories/', f'/listing/{prefix}products/?page=2', f'/shop/{prefix}list/']
+    paths += [f'/listing/{prefix}products/?category_id={pk}' for pk in data['categories']]
+    paths += [f'/listing/{prefix}products/{pk}/' for pk in data['products']]
+    paths += [f'/listing/{prefix}product/{pk}/reviews/' for pk in data['products']]
+    paths += [f'/order/{prefix}list/?customer_id={pk}' for pk in data['customers']]
+    return paths
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(name, workers, env):
+    server = SERVERS[name]
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', *server['args'], '--workers', str(workers),
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    process = subprocess.Popen(command, env={**env, **server['env']})
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} server exited with {process.returncode}")
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{name} server did not start")
+
+
+async def fetch(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def load(port, paths, concurrency, duration, rng):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await fetch(port, rng.choice(paths))
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    ms = [seconds * 1000 for seconds in latencies]
+    return {
+        'requests': len(ms),
+        'errors': errors,
+        'rps': round(len(ms) / elapsed, 1),
+        'p50_ms': round(percentile(ms, 50), 2) if ms else None,
+        'p99_ms': round(percentile(ms, 99), 2) if ms else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', default='1,10,50,200', help="Comma separated numbers of concurrent clients.")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds per concurrency level.")
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--servers', default='wsgi,asgi')
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+    levels = [int(n) for n in args.concurrency.split(',')]
+
+    setup()
+    from benchmarks.api import seed
+    from listing.models import Category
+    from order.models import Order
+
+    results = {'workers': args.workers, 'duration': args.duration, 'servers': {}}
+    with test_database() as connection:
+        rng = random.Random(args.seed)
+        seed(rng)
+        data = {
+            'categories': list(Category.objects.values_list('pk', flat=True)),
+            'products': list(Order.objects.values_list('product_id', flat=True).distinct()[:50]),
+            'customers': list(Order.objects.values_list('customer_id', flat=True).distinct()[:20]),
+        }
+        # the servers are separate processes, they have to connect to the test database by name
+        env = {
+            **os.environ, 'DB_NAME': connection.settings_dict['NAME'],
+            'DEBUG': 'False', 'RESPONSE_CACHE_ENABLED': 'False',
+        }
+        connection.close()
+
+        for name in args.servers.split(','):
+            paths = read_paths(SERVERS[name]['prefix'], data)
+            process, port = start_server(name, args.workers, env)
+            try:
+                asyncio.run(load(port, paths, min(levels), args.warmup, rng))
+                results['servers'][name] = {
+                    concurrency: asyncio.run(load(port, paths, concurrency, args.duration, rng))
+                    for concurrency in levels
+                }
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(f"{args.workers} workers per server, {args.duration:g}s per level")
+    for name, rows in results['servers'].items():
+        for concurrency, row in rows.items():
+            print(f"  {name} c={concurrency:<4} {row['rps']:8.1f} req/s  p50 {row['p50_ms']} ms  "
+                  f"p99 {row['p99_ms']} ms  errors {row['errors']}")
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Per-request database connection overhead: a new connection per request vs the configured connection settings.
+
+    python -m benchmarks.connections --requests 500 --queries 3
+
+Each simulated request goes through Django's request_started/request_finished
+signals, which is where connections are closed or kept according to
+CONN_MAX_AGE, so the numbers include the handshake (and TLS/pooler hop)
+exactly as a real request would pay it. Runs against the configured database
+and only issues SELECT 1.
+"""
+import argparse
+import copy
+import statistics
+import time
+
+from benchmarks.utils import setup, write_results
+
+
+def baseline_settings(settings_dict):
+    """The connection settings before persistent connections: no reuse, no pool, no health checks."""
+    baseline = copy.deepcopy(settings_dict)
+    baseline.update({'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False})
+    baseline['OPTIONS'].pop('pool', None)
+    return baseline
+
+
+def run(alias, requests, queries):
+    from django.core import signals
+    from django.db import connections
+    from django.db.backends.signals import connection_created
+
+    connection = connections[alias]
+    connect_times = []
+    original_connect = connection.connect
+
+    def timed_connect():
+        started = time.perf_counter()
+        original_connect()
+        connect_times.append(time.perf_counter() - started)
+    connection.connect = timed_connect
+
+    created = []
+
+    def on_created(sender, connection, **kwargs):
+        if connection.alias == alias:
+            created.append(1)
+    connection_created.connect(on_created)
+
+    latencies = []
+    try:
+        for _ in range(requests):
+            started = time.perf_counter()
+            signals.request_started.send(sender=None)
+            with connection.cursor() as cursor:
+                for _ in range(queries):
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+            signals.request_finished.send(sender=None)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        connection_created.disconnect(on_created)
+        del connection.connect
+        connection.close()
+
+    return {
+        'requests': requests,
+        'connections_opened': len(created),
+        'mean_request_ms': round(statistics.mean(latencies) * 1000, 3),
+        'p95_request_ms': round(sorted(latencies)[int(len(latencies) * 0.95)] * 1000, 3),
+        'connect_ms_per_request': round(sum(connect_times) * 1000 / requests, 3),
+        'throughput_rps': round(requests / sum(latencies), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--queries', type=int, default=3, help="Queries per simulated request.")
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connections
+
+    configured = connections['default'].settings_dict
+    connections.settings['baseline'] = baseline_settings(configured)
+
+    results = {
+        'database': f"{configured['ENGINE']} {configured['HOST'] or configured['NAME']}:{configured['PORT']}",
+        'per_request': run('baseline', args.requests, args.queries),
+        'configured': run('default', args.requests, args.queries),
+    }
+    results['configured']['settings'] = {
+        key: configured.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'DISABLE_SERVER_SIDE_CURSORS')
+    }
+    results['configured']['settings']['pool'] = 'pool' in configured['OPTIONS']
+
+    print(f"database: {results['database']}, {args.requests} requests x {args.queries} queries")
+    for mode in ('per_request', 'configured'):
+        row = results[mode]
+        print(f"  {mode:>12}: {row['connections_opened']:5} connections, {row['connect_ms_per_request']:8.3f} ms connecting "
+              f"per request, mean {row['mean_request_ms']:.3f} ms, {row['throughput_rps']} req/s")
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Login throughput with and without the Django session write.
+
+    python -m benchmarks.login --logins 100 --hash-iterations 870000
+
+Runs in a single process, so the numbers are logins per second per core.
+"""
+import argparse
+import time
+
+from benchmarks.utils import setup, test_database, write_results
+
+
+def bench(client, username, password, logins):
+    started, cpu_started = time.perf_counter(), time.process_time()
+    for _ in range(logins):
+        response = client.post('/user/login/', {'username': username, 'password': password})
+        assert 'token' in response.json(), response.content
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    return {
+        'logins_per_sec': round(logins / elapsed, 1),
+        'cpu_ms_per_login': round(cpu * 1000 / logins, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--hash-iterations', type=int, default=None)
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.test import Client, override_settings
+
+    iterations = args.hash_iterations or settings.PASSWORD_HASH_ITERATIONS
+    results = {'hash_iterations': iterations}
+    with test_database(), override_settings(PASSWORD_HASH_ITERATIONS=iterations):
+        User.objects.create_user('bench', password='bench-password')
+        for mode, creates_session in (('session', True), ('token_only', False)):
+            with override_settings(LOGIN_CREATES_SESSION=creates_session):
+                results[mode] = bench(Client(), 'bench', 'bench-password', args.logins)
+            print(f"{mode:>10}: {results[mode]}")
+
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Time list reads through ModelSerializer vs the values_list() row readers used by FastListMixin.
+
+    python -m benchmarks.readers --rows 5000
+
+Both paths include the query; results are in ms per 1,000 rows.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.utils import setup, test_database, write_results
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from benchmarks.api import seed
+    from listing.models import Product, Review
+    from listing.serializers import ProductSerializer, ReviewSerializer
+    from order.models import Order
+    from order.serializers import OrderSerializer
+    from shop.models import Shop
+    from shop.serializers import ShopSerializer
+    from JuicyCart_Tropicals.readers import row_reader
+
+    results = {'rows': args.rows}
+    with test_database():
+        seed(random.Random(args.seed), shops=min(args.rows, 500), products=args.rows, orders=args.rows, reviews=args.rows)
+        for model, serializer_class in ((Product, ProductSerializer), (Order, OrderSerializer),
+                                        (Shop, ShopSerializer), (Review, ReviewSerializer)):
+            queryset = model.objects.order_by('pk')
+            columns, to_dict = row_reader(serializer_class())
+            serialized = lambda: serializer_class(list(queryset), many=True).data
+            fast = lambda: [to_dict(row) for row in queryset.values_list(*columns)]
+            assert [dict(item) for item in serialized()] == fast(), f"{serializer_class.__name__} output differs"
+
+            count = queryset.count()
+            per_thousand = lambda seconds: round(seconds * 1000 * 1000 / count, 2)
+            results[model.__name__] = {
+                'rows': count,
+                'serializer_ms': per_thousand(best_of(serialized, args.repeat)),
+                'fast_ms': per_thousand(best_of(fast, args.repeat)),
+            }
+
+    print("ms per 1,000 rows, query included")
+    for name, row in results.items():
+        if name != 'rows':
+            print(f"  {name:>8} ({row['rows']:6} rows): serializer {row['serializer_ms']:8.2f}, fast {row['fast_ms']:8.2f}, "
+                  f"x{row['serializer_ms'] / row['fast_ms']:.1f}")
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Render and parse a 100-item ProductSerializer page with DRF's JSON classes and the orjson-backed ones.
+
+    python -m benchmarks.renderers --items 100 --rounds 2000
+
+Serializer output is built once up front (no database needed), so only the
+JSON encoding and decoding are timed.
+"""
+import argparse
+import io
+import timeit
+from decimal import Decimal
+
+from benchmarks.utils import setup, write_results
+
+
+def product_page(items):
+    from listing.models import Product
+    from listing.serializers import ProductSerializer
+
+    products = [
+        Product(
+            id=i, shop_id=i % 7 + 1, category_id=i % 5 + 1, name=f'Himsagar mango {i}', price=Decimal('120.50') + i,
+            available=1000 - i, sold=i * 3, about='Sweet, juicy and hand picked in Rajshahi. ' * 6,
+        )
+        for i in range(1, items + 1)
+    ]
+    return ProductSerializer(products, many=True).data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from JuicyCart_Tropicals.parsers import FastJSONParser
+    from JuicyCart_Tropicals.renderers import FastJSONRenderer, orjson
+
+    data = product_page(args.items)
+    body = JSONRenderer().render(data)
+    assert FastJSONRenderer().render(data) == body, "renderers disagree"
+
+    def per_call_us(fn):
+        return min(timeit.repeat(fn, number=args.rounds, repeat=3)) / args.rounds * 1e6
+
+    results = {'items': args.items, 'bytes': len(body), 'orjson': orjson.__version__ if orjson else None}
+    for name, renderer, json_parser in (('drf', JSONRenderer(), JSONParser()), ('fast', FastJSONRenderer(), FastJSONParser())):
+        results[name] = {
+            'render_us': round(per_call_us(lambda: renderer.render(data)), 1),
+            'parse_us': round(per_call_us(lambda: json_parser.parse(io.BytesIO(body))), 1),
+        }
+
+    print(f"{args.items} products, {len(body)} bytes, orjson {results['orjson']}")
+    for name in ('drf', 'fast'):
+        print(f"  {name:>5}: render {results[name]['render_us']:8.1f} us, parse {results[name]['parse_us']:8.1f} us")
+    print(f"  speedup: render x{results['drf']['render_us'] / results['fast']['render_us']:.1f}, "
+          f"parse x{results['drf']['parse_us'] / results['fast']['parse_us']:.1f}")
+    if args.output:
+        write_results(args.output, results)
+
+
+if __name__ == '__main__':
+    main()
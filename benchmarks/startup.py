@@ -0,0 +1,108 @@
+"""Cold start profile of the WSGI app: time to import, load the URLconf and answer a first request, and per-module import time.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --path /listing/categories/ --top 30
+
+Every run is a fresh interpreter started with `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from benchmarks.utils import write_results
+
+CHILD = r'''
+import io, json, os, sys, time
+
+started = time.perf_counter()
+from JuicyCart_Tropicals.wsgi import application
+imported = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls_loaded = time.perf_counter()
+
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'QUERY_STRING': '', 'SERVER_NAME': '127.0.0.1',
+    'SERVER_PORT': '80', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+    'HTTP_AUTHORIZATION': f"Bearer {os.environ['METRICS_TOKEN']}",
+}
+status = []
+b''.join(application(environ, lambda s, headers, exc_info=None: status.append(s)))
+answered = time.perf_counter()
+
+print(json.dumps({
+    'wsgi_import_ms': (imported - started) * 1000,
+    'urlconf_ms': (urls_loaded - imported) * 1000,
+    'first_request_ms': (answered - urls_loaded) * 1000,
+    'total_ms': (answered - started) * 1000,
+    'status': status[0],
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us, depth)] from `python -X importtime` output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return modules
+
+
+def run_once(settings_module, path):
+    # /metrics/ answers 404 without a token when DEBUG is off
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module, 'METRICS_TOKEN': os.environ.get('METRICS_TOKEN') or 'startup'}
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, path],
+        capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    if proc.returncode:
+        sys.exit(proc.stderr)
+    return json.loads(proc.stdout.strip().splitlines()[-1]), parse_importtime(proc.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'JuicyCart_Tropicals.settings'))
+    parser.add_argument('--path', default='/metrics/', help="Path of the first request, ideally one that needs no database.")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', default=None, help="Write results as JSON to this file.")
+    args = parser.parse_args()
+
+    runs = [run_once(args.settings, args.path) for _ in range(args.runs)]
+    phases = {key: round(statistics.median(r[0][key] for r in runs), 1) for key in runs[0][0] if key.endswith('_ms')}
+    modules = runs[-1][1]
+
+    packages = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        packages[name.split('.')[0]] += self_us
+    slowest = sorted(modules, key=lambda m: m[2], reverse=True)
+
+    print(f"settings: {args.settings}, median of {args.runs} cold starts, first request {runs[-1][0]['status']}")
+    for key, value in phases.items():
+        print(f"  {key:>18}: {value:8.1f}")
+    print(f"\nimport time by top-level package (self time, ms):")
+    for package, us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {us / 1000:8.1f}  {package}")
+    print(f"\nslowest modules (cumulative, ms):")
+    for name, _, cumulative_us, depth in slowest[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f}  {'  ' * depth}{name}")
+
+    if args.output:
+        write_results(args.output, {
+            'settings': args.settings, 'phases': phases,
+            'packages_ms': {p: us / 1000 for p, us in packages.items()},
+            'modules_ms': {name: cumulative_us / 1000 for name, _, cumulative_us, _ in slowest},
+        })
+
+
+if __name__ == '__main__':
+    main()
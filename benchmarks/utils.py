@@ -0,0 +1,38 @@
+import contextlib
+import json
+import os
+import sys
+
+import django
+
+
+def setup():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'JuicyCart_Tropicals.settings')
+    # a benchmark client sends far more than a client's budget, the 429s would be measured instead
+    os.environ.setdefault('THROTTLE_ENABLED', 'false')
+    # one process, so the local memory cache sees every invalidation and measures what a shared cache would
+    os.environ.setdefault('RESPONSE_CACHE_ENABLED', 'true')
+    django.setup()
+
+
+@contextlib.contextmanager
+def test_database(keepdb=False):
+    """Run against a throwaway copy of the configured database, like manage.py test does."""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def write_results(path, results):
+    with open(path, 'w') as fp:
+        json.dump(results, fp, indent=2, default=str)
+    print(f"results written to {path}")
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# Share prometheus metrics between workers, see JuicyCart_Tropicals/metrics.py
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='juicycart-metrics-'))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,21 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from listing.snapshots import CatalogBuilder
+
+
+class Command(BaseCommand):
+    help = "Render the catalog into static JSON files under CATALOG_SNAPSHOT_DIR, rewriting only files that changed."
+
+    def handle(self, *args, **options):
+        if not settings.CATALOG_SNAPSHOT_DIR:
+            raise CommandError("Set CATALOG_SNAPSHOT_DIR to build the catalog snapshots.")
+
+        started = time.monotonic()
+        builder = CatalogBuilder()
+        builder.build_all()
+        self.stdout.write(self.style.SUCCESS(
+            f"{builder.written} files written, {builder.unchanged} unchanged, {builder.removed} removed "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
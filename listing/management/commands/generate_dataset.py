@@ -0,0 +1,254 @@
+import argparse
+import bisect
+import contextlib
+import csv
+import io
+import itertools
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils import timezone
+from listing.models import Category, Product, Review
+from order.models import Order
+from shop.models import Shop
+from users.models import Customer, Seller
+
+MANGOES = ['Himsagar', 'Langra', 'Fazli', 'Amrapali', 'Gopalbhog', 'Khirsapat', 'Haribhanga', 'Ashwina', 'Lakshmanbhog', 'Mohonbhog']
+CITIES = ['Rajshahi', 'Chapainawabganj', 'Dinajpur', 'Rangpur', 'Dhaka', 'Satkhira', 'Naogaon', 'Chattogram']
+
+
+def at_least(minimum):
+    def parse(value):
+        number = int(value)
+        if number < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {number}")
+        return number
+    return parse
+
+
+def start_date(value):
+    """YYYY-MM-DD (or an ISO datetime), UTC unless it names a timezone."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+
+def zipf_cum_weights(n, s):
+    total, cum = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** s
+        cum.append(total)
+    return cum
+
+
+def weighted_index(rng, cum_weights):
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+@contextlib.contextmanager
+def explicit_timestamps(*models_):
+    """bulk_create always stamps auto_now(_add) fields with now(), switch that off to keep generated dates."""
+    fields = [f for m in models_ for f in m._meta.concrete_fields if getattr(f, 'auto_now_add', False) or getattr(f, 'auto_now', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+class Writer:
+    """Writes rows in chunks with COPY on Postgres and bulk_create everywhere else."""
+
+    def __init__(self, use_copy, chunk_size, now):
+        self.use_copy = use_copy and connection.vendor == 'postgresql'
+        self.chunk_size = chunk_size
+        self.now = now
+
+    def complete(self, model, values):
+        row = {}
+        for field in model._meta.concrete_fields:
+            if field.attname in values:
+                row[field.attname] = values[field.attname]
+            elif getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                row[field.attname] = self.now.date() if isinstance(field, models.DateField) and not isinstance(field, models.DateTimeField) else self.now
+            else:
+                row[field.attname] = field.get_default()
+        return row
+
+    def write(self, model, rows):
+        written = 0
+        rows = iter(rows)
+        while True:
+            chunk = [self.complete(model, values) for values in itertools.islice(rows, self.chunk_size)]
+            if not chunk:
+                return written
+            with transaction.atomic():
+                if self.use_copy:
+                    self._copy(model, chunk)
+                else:
+                    with explicit_timestamps(model):
+                        model.objects.bulk_create([model(**values) for values in chunk])
+            written += len(chunk)
+
+    def _copy(self, model, chunk):
+        columns = [f.attname for f in model._meta.concrete_fields]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in chunk:
+            writer.writerow([self._format(row[c]) for c in columns])
+        sql = 'COPY {} ({}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'.format(
+            connection.ops.quote_name(model._meta.db_table),
+            ', '.join(connection.ops.quote_name(model._meta.get_field(c).column) for c in columns),
+        )
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                buffer.seek(0)
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+    @staticmethod
+    def _format(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        return value
+
+
+class Command(BaseCommand):
+    help = "Generate a large, skewed and reproducible marketplace dataset for load and index testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        # every product needs a shop (one per seller) and a category
+        parser.add_argument('--sellers', type=at_least(1), default=50)
+        parser.add_argument('--customers', type=at_least(0), default=5000)
+        parser.add_argument('--categories', type=at_least(1), default=10)
+        parser.add_argument('--products', type=at_least(0), default=5000)
+        parser.add_argument('--reviews', type=at_least(0), default=20000)
+        parser.add_argument('--orders', type=at_least(0), default=100000)
+        parser.add_argument('--start', type=start_date, default='2025-01-01',
+                            help="Users and products are created on this date (YYYY-MM-DD, UTC), so a seed always gives the same rows.")
+        parser.add_argument('--days', type=at_least(1), default=365, help="Spread orders and reviews over this many days after --start.")
+        parser.add_argument('--zipf', type=float, default=1.1, help="Skew of product popularity, higher is more skewed.")
+        parser.add_argument('--chunk-size', type=at_least(1), default=10000)
+        parser.add_argument('--password', default=None, help="Give every generated user this password (hashed once).")
+        parser.add_argument('--no-copy', action='store_true', help="Use bulk_create even on Postgres.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = options['start']
+        writer = Writer(not options['no_copy'], options['chunk_size'], start)
+        password = make_password(options['password'])
+        started = time.monotonic()
+
+        def next_id(model):
+            return (model.objects.aggregate(top=models.Max('pk'))['top'] or 0) + 1
+
+        def step(label, count):
+            self.stdout.write(f"{label}: {count} rows ({time.monotonic() - started:.1f}s)")
+
+        # users: sellers first, then customers, with explicit ids so foreign keys need no read back
+        first_user = next_id(User)
+        seller_ids = list(range(first_user, first_user + options['sellers']))
+        customer_ids = list(range(first_user + options['sellers'], first_user + options['sellers'] + options['customers']))
+        step('users', writer.write(User, (
+            {'id': uid, 'username': f'gen_user_{uid}', 'email': f'gen_user_{uid}@example.com', 'password': password,
+             'first_name': rng.choice(MANGOES), 'is_active': True, 'date_joined': start}
+            for uid in seller_ids + customer_ids
+        )))
+        step('sellers', writer.write(Seller, (
+            {'user_id': uid, 'mobile_no': f'017{rng.randint(10000000, 99999999)}', 'full_address': rng.choice(CITIES)}
+            for uid in seller_ids
+        )))
+        step('customers', writer.write(Customer, (
+            {'user_id': uid, 'full_address': rng.choice(CITIES), 'balance': Decimal('0.00')} for uid in customer_ids
+        )))
+
+        first_shop = next_id(Shop)
+        shop_ids = list(range(first_shop, first_shop + len(seller_ids)))
+        step('shops', writer.write(Shop, (
+            {'id': sid, 'owner_id': uid, 'name': f'{rng.choice(MANGOES)} House {sid}', 'description': 'Fresh from the orchard',
+             'location': rng.choice(CITIES)}
+            for sid, uid in zip(shop_ids, seller_ids)
+        )))
+
+        first_category = next_id(Category)
+        category_ids = list(range(first_category, first_category + options['categories']))
+        step('categories', writer.write(Category, (
+            {'id': cid, 'name': f'{MANGOES[i % len(MANGOES)]} {cid}', 'slug': f'{MANGOES[i % len(MANGOES)].lower()}-{cid}'}
+            for i, cid in enumerate(category_ids)
+        )))
+
+        # a few big shops and categories hold most of the catalog
+        first_product = next_id(Product)
+        product_ids = list(range(first_product, first_product + options['products']))
+        shop_of = rng.choices(shop_ids, cum_weights=zipf_cum_weights(len(shop_ids), 1.0), k=len(product_ids))
+        category_of = rng.choices(category_ids, cum_weights=zipf_cum_weights(len(category_ids), 1.0), k=len(product_ids))
+        prices = [Decimal(rng.randint(60, 600)) for _ in product_ids]
+        step('products', writer.write(Product, (
+            {'id': pid, 'shop_id': shop_of[i], 'category_id': category_of[i], 'name': f'{rng.choice(MANGOES)} mango {pid}',
+             'price': prices[i], 'available': rng.randint(0, 5000), 'sold': 0, 'about': 'Sweet, juicy and hand picked. ' * rng.randint(1, 8)}
+            for i, pid in enumerate(product_ids)
+        )))
+
+        # Zipf popularity over a seeded shuffle of the products, milder skew for how often customers buy
+        popularity = list(range(len(product_ids)))
+        rng.shuffle(popularity)
+        product_weights = zipf_cum_weights(len(popularity), options['zipf'])
+        customer_weights = zipf_cum_weights(len(customer_ids), 0.8)
+        seconds = options['days'] * 86400
+        sold = [0] * len(product_ids)
+
+        def orders():
+            for _ in range(options['orders']):
+                index = popularity[weighted_index(rng, product_weights)]
+                quantity = rng.choices((1, 2, 3, 5, 10), weights=(50, 25, 12, 8, 5))[0]
+                status = rng.choices(('Completed', 'Pending', 'Cancelled'), weights=(75, 15, 10))[0]
+                if status != 'Cancelled':
+                    sold[index] += quantity
+                yield {
+                    'product_id': product_ids[index], 'customer_id': customer_ids[weighted_index(rng, customer_weights)],
+                    'quantity': quantity, 'total_price': prices[index] * quantity, 'status': status,
+                    'created_at': start + timedelta(seconds=rng.randrange(seconds)),
+                }
+
+        def reviews():
+            for _ in range(options['reviews']):
+                index = popularity[weighted_index(rng, product_weights)]
+                yield {
+                    'product_id': product_ids[index], 'user_id': customer_ids[weighted_index(rng, customer_weights)],
+                    'rating': rng.choices((1, 2, 3, 4, 5), weights=(3, 4, 13, 35, 45))[0], 'content': 'Tasty mangoes.',
+                    'created_at': (start + timedelta(seconds=rng.randrange(seconds))).date(),
+                }
+
+        if customer_ids and product_ids:
+            first_order, first_review = next_id(Order), next_id(Review)
+            step('orders', writer.write(Order, ({'id': first_order + i, **row} for i, row in enumerate(orders()))))
+            step('reviews', writer.write(Review, ({'id': first_review + i, **row} for i, row in enumerate(reviews()))))
+
+            updates = [Product(id=pid, sold=count) for pid, count in zip(product_ids, sold) if count]
+            Product.objects.bulk_update(updates, ['sold'], batch_size=options['chunk_size'])
+            step('product sold counters', len(updates))
+
+        # explicit ids leave Postgres sequences behind, move them past the new rows
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User, Shop, Category, Product, Order, Review]):
+                cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(f"done in {time.monotonic() - started:.1f}s"))
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from listing.models import ProductTombstone
+
+
+class Command(BaseCommand):
+    help = "Delete product tombstones older than CATALOG_TOMBSTONE_DAYS, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Defaults to CATALOG_TOMBSTONE_DAYS.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.CATALOG_TOMBSTONE_DAYS
+        expired = ProductTombstone.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=days))
+
+        deleted = 0
+        while True:
+            ids = list(expired.order_by('deleted_at', 'id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                deleted += ProductTombstone.objects.filter(id__in=ids).delete()[0]
+        # changes feed cursors older than this now get 410 and sync from scratch
+        self.stdout.write(self.style.SUCCESS(f"deleted {deleted} tombstones older than {days} days"))
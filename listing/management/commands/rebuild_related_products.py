@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+from listing.recommendations import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recount the \"customers also bought\" pairs from all completed orders, read in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Orders fetched and pairs written per batch.")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"{written} related product pairs in {time.monotonic() - started:.1f}s"))
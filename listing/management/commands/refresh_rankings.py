@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+from listing.rankings import refresh
+
+
+class Command(BaseCommand):
+    help = "Add the orders and reviews since the last run to the trending scores and re-rank the categories they touched."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Recompute all scores from recent history and re-rank every category.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        products, categories = refresh(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{products} products scored, {categories} categories ranked in {time.monotonic() - started:.1f}s"
+        ))
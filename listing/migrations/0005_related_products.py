@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 19:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listing', '0004_product_changes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('customers', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='listing.product')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bought_with', to='listing.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['product', '-customers', 'related'], name='related_product_top_idx')],
+                'constraints': [models.UniqueConstraint(fields=('product', 'related'), name='related_product_unique')],
+            },
+        ),
+    ]
@@ -25,11 +25,105 @@ class Product(models.Model):
     available = models.PositiveIntegerField(default=0)
     sold = models.PositiveIntegerField(default=0)
     about = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # the changes feed pages through products by (updated_at, id)
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+        ]
+
+    # columns the product lists can be filtered on
+    FILTERED_FIELDS = ('category_id', 'shop_id', 'name', 'price')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets listing.signals find the lists and catalog pages a product moved out of
+        instance._loaded = {field: instance.__dict__[field] for field in cls.FILTERED_FIELDS if field in instance.__dict__}
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # after the post_save receivers, which compare against the values as loaded
+        self._loaded = {field: self.__dict__[field] for field in self.FILTERED_FIELDS if field in self.__dict__}
+
+    def filtered_fields_changed(self):
+        """Whether a save may move the product in or out of a filtered list, true when the loaded values are unknown."""
+        loaded = getattr(self, '_loaded', {})
+        return any(field not in loaded or loaded[field] != getattr(self, field) for field in self.FILTERED_FIELDS)
 
     def __str__(self):
         return f"{self.name}"
 
 
+class ProductTombstone(models.Model):
+    """A deleted product, kept so the changes feed can tell clients to drop it."""
+    product_id = models.BigIntegerField()
+    shop_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx')]
+
+    def __str__(self):
+        return f"Deleted product {self.product_id}"
+
+
+class RelatedProduct(models.Model):
+    """How many customers completed orders of both `product` and `related`, see listing/recommendations.py."""
+    # the unique constraint leads with product, a separate index on it would be redundant
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+', db_index=False)
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='bought_with')
+    customers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['product', 'related'], name='related_product_unique')]
+        indexes = [
+            # "customers also bought" reads a product's top pairs straight off this index
+            models.Index(fields=['product', '-customers', 'related'], name='related_product_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} -> {self.related_id} ({self.customers})"
+
+
+class TrendingScore(models.Model):
+    """A product's order and review activity with exponential decay, see listing/rankings.py."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    # as of RankingRefresh.epoch, so new activity is added without decaying every row
+    score = models.FloatField(default=0)
+
+
+class ProductRanking(models.Model):
+    """The top products of a category (or of the whole catalog when category is null), rebuilt by refresh_rankings."""
+    KIND_CHOICES = [
+        ('trending', 'Trending'),
+        ('bestseller', 'Best seller'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='+', db_index=False)
+    rank = models.PositiveIntegerField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='rankings')
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'category', 'rank'], name='product_ranking_idx')]
+
+    def __str__(self):
+        return f"{self.kind} #{self.rank}: {self.product_id}"
+
+
+class RankingRefresh(models.Model):
+    """Where refresh_rankings left off, a single row."""
+    last_order_id = models.BigIntegerField(default=0)
+    last_review_id = models.BigIntegerField(default=0)
+    epoch = models.DateTimeField()
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+
 class Review(models.Model):
     user = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name="reviews")
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="reviews")
@@ -0,0 +1,129 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from listing.models import Category, Product, ProductRanking, RankingRefresh, Review, TrendingScore
+from order.models import Order
+
+# Trending: every order (not cancelled) adds 1 to its product's score and
+# every review TRENDING_REVIEW_WEIGHT, both halving every
+# TRENDING_HALF_LIFE_HOURS. Scores are kept as of a fixed epoch, as
+# sum(weight * 2^((t - epoch) / half life)), so a refresh only adds the
+# activity since the last one and never rewrites the other rows; the order of
+# products is the same at any point in time, only touched categories are
+# re-ranked. The epoch moves forward (one update of every score) once the
+# values grow large.
+#
+# An order cancelled after it was counted keeps counting until it decays.
+#
+# Best sellers: the lifetime Product.sold counter, ranked in the categories
+# that got orders since the last refresh.
+#
+# ProductRanking holds the top RANKING_SIZE of each kind per category and for
+# the whole catalog (category null), read with one index range scan.
+
+REBASE_AFTER = 30  # half lives, 2^30 is still far from float limits
+FULL_WINDOW = 10  # half lives of history replayed by --full, older activity weighs under 0.1%
+
+
+def half_life():
+    return timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+
+
+def growth(moment, epoch):
+    return 2 ** ((moment - epoch) / half_life())
+
+
+def review_time(day):
+    # reviews only record their date
+    return timezone.make_aware(datetime.combine(day, time(12)))
+
+
+def collect_activity(state, upto_order, upto_review, since, chunk_size):
+    """Score to add per product id for the orders and reviews after the state's watermarks."""
+    gains = Counter()
+    orders = Order.objects.filter(id__gt=state.last_order_id, id__lte=upto_order).exclude(status='Cancelled')
+    reviews = Review.objects.filter(id__gt=state.last_review_id, id__lte=upto_review)
+    if since:
+        orders, reviews = orders.filter(created_at__gte=since), reviews.filter(created_at__gte=since.date())
+    for product_id, created_at in orders.values_list('product_id', 'created_at').iterator(chunk_size=chunk_size):
+        gains[product_id] += growth(created_at, state.epoch)
+    for product_id, day in reviews.values_list('product_id', 'created_at').iterator(chunk_size=chunk_size):
+        gains[product_id] += settings.TRENDING_REVIEW_WEIGHT * growth(review_time(day), state.epoch)
+    return gains
+
+
+def add_scores(gains, chunk_size):
+    product_ids = list(gains)
+    for start in range(0, len(product_ids), chunk_size):
+        chunk = product_ids[start:start + chunk_size]
+        existing = TrendingScore.objects.in_bulk(chunk)
+        for row in existing.values():
+            row.score += gains[row.pk]
+        TrendingScore.objects.bulk_update(existing.values(), ['score'])
+        # products deleted meanwhile are skipped by the join on Product
+        missing = Product.objects.filter(id__in=[pk for pk in chunk if pk not in existing]).values_list('id', flat=True)
+        TrendingScore.objects.bulk_create([TrendingScore(product_id=pk, score=gains[pk]) for pk in missing])
+
+
+def replace_ranking(kind, category_id, ranked):
+    """`ranked` is (product_id, score) pairs, best first."""
+    ProductRanking.objects.filter(kind=kind, category_id=category_id).delete()
+    ProductRanking.objects.bulk_create([
+        ProductRanking(kind=kind, category_id=category_id, rank=rank, product_id=product_id, score=score)
+        for rank, (product_id, score) in enumerate(ranked, 1)
+    ])
+
+
+def rank(category_ids, include_global, decay):
+    """Rebuilds both rankings of the given categories, `decay` turns epoch scores into current ones."""
+    size = settings.RANKING_SIZE
+    for category_id in [*category_ids, *([None] if include_global else [])]:
+        scores, products = TrendingScore.objects.all(), Product.objects.filter(sold__gt=0)
+        if category_id is not None:
+            scores, products = scores.filter(product__category_id=category_id), products.filter(category_id=category_id)
+        trending = scores.order_by('-score', 'product_id').values_list('product_id', 'score')[:size]
+        replace_ranking('trending', category_id, [(product_id, score * decay) for product_id, score in trending])
+        replace_ranking('bestseller', category_id, list(products.order_by('-sold', 'id').values_list('id', 'sold')[:size]))
+
+
+def refresh(full=False, chunk_size=5000):
+    """
+    Adds the activity since the last refresh and re-ranks the categories it
+    touched, or with `full` recomputes everything from recent history.
+    Returns (products scored, categories ranked).
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # one refresh at a time, the others wait here
+        state, _ = RankingRefresh.objects.select_for_update().get_or_create(pk=1, defaults={'epoch': now})
+        since = None
+        if full:
+            TrendingScore.objects.all().delete()
+            state.last_order_id = state.last_review_id = 0
+            state.epoch, since = now, now - FULL_WINDOW * half_life()
+        elif now - state.epoch > REBASE_AFTER * half_life():
+            TrendingScore.objects.update(score=F('score') / growth(now, state.epoch))
+            state.epoch = now
+
+        # rows inserted from here on wait for the next refresh (one still uncommitted below these ids is missed until --full)
+        upto_order = Order.objects.aggregate(last=Max('id'))['last'] or 0
+        upto_review = Review.objects.aggregate(last=Max('id'))['last'] or 0
+        gains = collect_activity(state, upto_order, upto_review, since, chunk_size)
+        add_scores(gains, chunk_size)
+
+        if full:
+            category_ids = set(Category.objects.values_list('id', flat=True))
+        else:
+            product_ids, category_ids = list(gains), set()
+            for start in range(0, len(product_ids), chunk_size):
+                category_ids.update(Product.objects.filter(id__in=product_ids[start:start + chunk_size]).values_list('category_id', flat=True))
+        rank(category_ids, include_global=full or bool(gains), decay=1 / growth(now, state.epoch))
+
+        state.last_order_id, state.last_review_id = max(upto_order, state.last_order_id), max(upto_review, state.last_review_id)
+        state.refreshed_at = now
+        state.save()
+    return len(gains), len(category_ids)
@@ -0,0 +1,75 @@
+import itertools
+from collections import Counter, defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q
+from listing.models import RelatedProduct
+from order.models import Order
+
+# "Customers also bought": RelatedProduct counts, for each pair of products,
+# the customers with completed orders of both. A completed order adds its
+# customer to the pairs of its product with the RELATED_PRODUCTS_HISTORY
+# products they most recently bought, so a read is a single index scan of
+# (product, -customers). Concurrent first increments of the same new pair can
+# lose one count; rebuild() (the rebuild_related_products command) recounts
+# everything from the orders and trims each product to its
+# RELATED_PRODUCTS_KEEP best pairs.
+
+
+def record_purchase(customer_id, product_id):
+    """Counts a newly completed order of `product_id` by `customer_id`."""
+    completed = Order.objects.filter(customer_id=customer_id, status='Completed')
+    if completed.filter(product_id=product_id).count() > 1:
+        # the customer was already counted for this product's pairs
+        return
+    others = list(
+        completed.exclude(product_id=product_id).values('product_id').annotate(last=Max('created_at'))
+        .order_by('-last').values_list('product_id', flat=True)[:settings.RELATED_PRODUCTS_HISTORY]
+    )
+    if not others:
+        return
+
+    pairs = Q(product_id=product_id, related_id__in=others) | Q(product_id__in=others, related_id=product_id)
+    with transaction.atomic():
+        existing = set(RelatedProduct.objects.filter(pairs).values_list('product_id', 'related_id'))
+        RelatedProduct.objects.filter(pairs).update(customers=F('customers') + 1)
+        new = [(product_id, other) for other in others] + [(other, product_id) for other in others]
+        RelatedProduct.objects.bulk_create(
+            [RelatedProduct(product_id=a, related_id=b, customers=1) for a, b in new if (a, b) not in existing],
+            ignore_conflicts=True,
+        )
+
+
+def count_pairs(chunk_size):
+    """{product_id: Counter({related_id: customers})} from all completed orders, read in chunks by customer."""
+    counts = defaultdict(Counter)
+    orders = (
+        Order.objects.filter(status='Completed').order_by('customer_id', '-created_at')
+        .values_list('customer_id', 'product_id').iterator(chunk_size=chunk_size)
+    )
+    for _, rows in itertools.groupby(orders, key=itemgetter(0)):
+        # distinct, most recent first, as record_purchase sees them
+        products = list(dict.fromkeys(product_id for _, product_id in rows))[:settings.RELATED_PRODUCTS_HISTORY + 1]
+        for product_id, related_id in itertools.permutations(products, 2):
+            counts[product_id][related_id] += 1
+    return counts
+
+
+def rebuild(chunk_size=2000):
+    """Replaces the whole table, returns the number of pairs kept."""
+    counts = count_pairs(chunk_size)
+    rows = (
+        RelatedProduct(product_id=product_id, related_id=related_id, customers=customers)
+        for product_id, related in counts.items()
+        for related_id, customers in related.most_common(settings.RELATED_PRODUCTS_KEEP)
+    )
+    written = 0
+    # readers keep seeing the old pairs until the new ones are committed
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        while batch := list(itertools.islice(rows, chunk_size)):
+            RelatedProduct.objects.bulk_create(batch)
+            written += len(batch)
+    return written
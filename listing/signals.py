@@ -0,0 +1,89 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from listing.models import Category, Product, ProductTombstone, Review
+from listing.snapshots import CatalogBuilder
+from shop.models import Shop
+from JuicyCart_Tropicals.cache import invalidate_instance, invalidate_tags
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_cached_listing(sender, instance, signal, created=False, **kwargs):
+    membership_changed = created or signal is post_delete
+    if sender is Product and not membership_changed:
+        # a new category, shop, name or price moves the product between filtered lists
+        membership_changed = instance.filtered_fields_changed()
+    invalidate_instance(instance, membership_changed=membership_changed)
+    if sender is Product:
+        # a product moved to another shop leaves the dashboard of the one it was loaded with too
+        shop_ids = {instance.shop_id, getattr(instance, '_loaded', {}).get('shop_id', instance.shop_id)}
+        invalidate_tags(*(f'shop:{shop_id}:dashboard' for shop_id in shop_ids))
+
+
+def product_shop_id(instance, origin=None):
+    """
+    Shop of a review's or order's product: from the product when it is loaded,
+    otherwise read once per product for all the rows one delete() cascades to.
+    """
+    if type(instance).product.is_cached(instance):
+        return instance.product.shop_id
+    shop_ids = (instance if origin is None else origin).__dict__.setdefault('_product_shop_ids', {})
+    if instance.product_id not in shop_ids:
+        shop_ids[instance.product_id] = Product.objects.filter(pk=instance.product_id).values_list('shop_id', flat=True).first()
+    return shop_ids[instance.product_id]
+
+
+def deleted_with_product(origin):
+    """Whether a delete cascades from a product or shop, whose product receivers already invalidate the dashboard."""
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model in (Product, Shop)
+
+
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_cached_reviews(sender, instance, origin=None, **kwargs):
+    tags = [f'product:{instance.product_id}:reviews']
+    if not deleted_with_product(origin):
+        tags.append(f'shop:{product_shop_id(instance, origin)}:dashboard')
+    invalidate_tags(*tags)
+
+
+@receiver(post_delete, sender=Product)
+def record_product_tombstone(sender, instance, **kwargs):
+    # read by the catalog changes feed, product rows are gone once deleted
+    ProductTombstone.objects.create(product_id=instance.pk, shop_id=instance.shop_id)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def refresh_product_snapshots(sender, instance, signal, created=False, **kwargs):
+    if not settings.CATALOG_SNAPSHOT_DIR:
+        return
+    old_category_id = getattr(instance, '_loaded', {}).get('category_id')
+    product_id, shop_id, category_id = instance.pk, instance.shop_id, instance.category_id
+    membership_changed = created or signal is post_delete
+    # a failed snapshot write must not fail the request that changed the product
+    transaction.on_commit(
+        lambda: CatalogBuilder().product_changed(product_id, shop_id, category_id, membership_changed, old_category_id),
+        robust=True,
+    )
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Shop)
+def refresh_group_snapshots(sender, instance, signal, created=False, **kwargs):
+    if not settings.CATALOG_SNAPSHOT_DIR:
+        return
+    group, key = ('categories' if sender is Category else 'shops'), instance.pk
+
+    def refresh():
+        builder = CatalogBuilder()
+        if sender is Category:
+            builder.build_categories()
+        if signal is post_delete:
+            builder.drop_group(group, key)
+        elif created:
+            builder.build_pages(group, key)
+
+    transaction.on_commit(refresh, robust=True)
@@ -0,0 +1,176 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from JuicyCart_Tropicals.readers import row_reader
+from JuicyCart_Tropicals.renderers import FastJSONRenderer
+from listing.models import Category, Product
+from listing.serializers import CategorySerializer, ProductSerializer
+from shop.models import Shop
+
+# The catalog prerendered as JSON files under CATALOG_SNAPSHOT_DIR, served by
+# StaticFilesMiddleware at CATALOG_SNAPSHOT_URL without reaching a view:
+#
+#   categories.json                  every category
+#   products/<id>.json               a product, as /listing/products/<id>/
+#   categories/<id>/<page>.json      a category's products by id,
+#   shops/<id>/<page>.json           a shop's products by id,
+#                                    {"next", "previous", "results"}
+#
+# build_catalog writes all of it, the listing signals then rewrite only the
+# files a product, category or shop change touches. A file is only replaced
+# when its bytes change, so the ETags of everything else stay valid. Pages
+# carry no total count, it would change every page of a category whenever a
+# product is added or removed.
+
+render = FastJSONRenderer().render
+
+# product column each kind of page is grouped by
+GROUPS = {'categories': 'category_id', 'shops': 'shop_id'}
+
+
+def snapshot_url(*parts):
+    return settings.CATALOG_SNAPSHOT_URL + '/'.join(map(str, parts)) + '.json'
+
+
+def snapshot_path(*parts):
+    return os.path.join(settings.CATALOG_SNAPSHOT_DIR, *map(str, parts)) + '.json'
+
+
+def product_rows(queryset):
+    """Serialized products of an ordered (and maybe sliced) queryset."""
+    reader = row_reader(ProductSerializer()) if settings.FAST_READ_ENABLED else None
+    if reader is None:
+        for product in queryset.iterator():
+            yield ProductSerializer(product).data
+        return
+    columns, to_dict = reader
+    for row in queryset.values_list(*columns).iterator():
+        yield to_dict(row)
+
+
+class CatalogBuilder:
+    def __init__(self):
+        self.written = self.unchanged = self.removed = 0
+        self.paths = set()
+
+    def put(self, parts, data):
+        path = snapshot_path(*parts)
+        self.paths.add(path)
+        content = render(data)
+        try:
+            with open(path, 'rb') as fp:
+                if fp.read() == content:
+                    self.unchanged += 1
+                    return
+        except FileNotFoundError:
+            pass
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # written aside and renamed, a request never reads half a file
+        fd, temporary = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+        self.written += 1
+
+    def drop(self, parts):
+        try:
+            os.remove(snapshot_path(*parts))
+            self.removed += 1
+        except FileNotFoundError:
+            pass
+
+    def drop_group(self, group, key):
+        directory = os.path.join(settings.CATALOG_SNAPSHOT_DIR, group, str(key))
+        if os.path.isdir(directory):
+            self.removed += len(os.listdir(directory))
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def build_categories(self):
+        self.put(['categories'], CategorySerializer(Category.objects.order_by('id'), many=True).data)
+
+    def build_product(self, product_id):
+        data = next(product_rows(Product.objects.filter(id=product_id)), None)
+        if data is None:
+            self.drop(['products', product_id])
+        else:
+            self.put(['products', product_id], data)
+
+    def put_page(self, group, key, number, results, more):
+        self.put([group, key, number], {
+            'next': snapshot_url(group, key, number + 1) if more else None,
+            'previous': snapshot_url(group, key, number - 1) if number > 1 else None,
+            'results': results,
+        })
+
+    def build_pages(self, group, key, first=1, last=None):
+        """Pages `first` to `last` of a group, to its end (dropping pages past it) when `last` is None."""
+        size = settings.CATALOG_SNAPSHOT_PAGE_SIZE
+        queryset = Product.objects.filter(**{GROUPS[group]: key}).order_by('id')
+        number, page = first, []
+        for data in product_rows(queryset[(first - 1) * size:None if last is None else last * size + 1]):
+            if len(page) == size:
+                self.put_page(group, key, number, page, more=True)
+                number, page = number + 1, []
+            page.append(data)
+        if last is not None and number > last:
+            # the row past `last` was only read to know there is a next page
+            return
+        if not page and number > 1:
+            # the group shrank by a page: drop it and end the list on the one before
+            self.drop_pages(group, key, number)
+            self.build_pages(group, key, number - 1, number - 1)
+            return
+        self.put_page(group, key, number, page, more=False)
+        if last is None:
+            self.drop_pages(group, key, number + 1)
+
+    def drop_pages(self, group, key, first):
+        number = first
+        while os.path.exists(snapshot_path(group, key, number)):
+            self.drop([group, key, number])
+            number += 1
+
+    def product_changed(self, product_id, shop_id, category_id, membership_changed=False, old_category_id=None):
+        """
+        Rewrites a product's file and the pages that hold it. Adding or removing
+        a product shifts every page after it, an edit only touches its own page.
+        """
+        self.build_product(product_id)
+        groups = [('shops', shop_id, membership_changed)]
+        if old_category_id is None or old_category_id == category_id:
+            groups.append(('categories', category_id, membership_changed))
+        else:
+            groups += [('categories', category_id, True), ('categories', old_category_id, True)]
+
+        size = settings.CATALOG_SNAPSHOT_PAGE_SIZE
+        for group, key, shifted in groups:
+            number = Product.objects.filter(**{GROUPS[group]: key}, id__lt=product_id).count() // size + 1
+            if shifted:
+                # from the page before, whose next link may come or go
+                self.build_pages(group, key, max(number - 1, 1))
+            else:
+                self.build_pages(group, key, number, number)
+
+    def build_all(self):
+        """Writes the whole catalog and removes files left from products, categories or shops that are gone."""
+        self.build_categories()
+        for data in product_rows(Product.objects.order_by('id')):
+            self.put(['products', data['id']], data)
+        for category_id in Category.objects.order_by('id').values_list('id', flat=True):
+            self.build_pages('categories', category_id)
+        for shop_id in Shop.objects.order_by('id').values_list('id', flat=True):
+            self.build_pages('shops', shop_id)
+
+        for directory, subdirectories, names in os.walk(settings.CATALOG_SNAPSHOT_DIR, topdown=False):
+            for name in names:
+                path = os.path.join(directory, name)
+                if path not in self.paths:
+                    os.remove(path)
+                    self.removed += 1
+            if directory != settings.CATALOG_SNAPSHOT_DIR and not os.listdir(directory):
+                os.rmdir(directory)
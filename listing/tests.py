@@ -1,3 +1,318 @@
-from django.test import TestCase
+import io
+import json
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from JuicyCart_Tropicals.testing import FastReadMixin, QueryBudgetMixin, create_marketplace
+from listing.models import Category, Product, RelatedProduct
+from order.models import Order
+from users.models import Customer
+from listing.serializers import ProductSerializer
+from listing.views import encode_cursor
+
+
+class ListingQueryBudgetTests(FastReadMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+        cls.product = cls.data['products'][0]
+
+    def test_category_list(self):
+        self.assertQueryBudget(1, 'get', '/listing/categories/')
+
+    def test_product_list(self):
+        self.assertQueryBudget(2, 'get', '/listing/products/', {'category_id': self.data['category'].id})
+
+    def test_product_detail(self):
+        self.assertQueryBudget(1, 'get', f'/listing/products/{self.product.id}/')
+
+    def test_product_batch_lookup(self):
+        ids = ','.join(str(p.id) for p in self.data['products'])
+        response = self.assertQueryBudget(1, 'get', '/listing/products/', {'ids': ids})
+        self.assertEqual(len(response.json()), len(self.data['products']))
+
+    def test_review_list(self):
+        self.assertQueryBudget(1, 'get', f'/listing/product/{self.product.id}/reviews/')
+
+    def test_fast_product_list(self):
+        Product.objects.filter(id=self.product.id).update(price=None, image=None)
+        response = self.assertFastReadMatches('/listing/products/', {'page_size': 100})
+        self.assertEqual(len(response.json()['results']), len(self.data['products']))
+
+    def test_fast_review_list(self):
+        self.assertFastReadMatches(f'/listing/product/{self.product.id}/reviews/')
+
+    def test_async_reads(self):
+        self.assertAsyncMatches('/listing/categories/', '/listing/async/categories/')
+        response = self.assertAsyncMatches('/listing/products/', '/listing/async/products/', {'page_size': 2, 'page': 2})
+        self.assertIsNotNone(response.json()['previous'])
+        self.assertAsyncMatches('/listing/products/', '/listing/async/products/', {'page': 'last', 'name': 'mango'})
+        self.assertAsyncMatches('/listing/products/', '/listing/async/products/', {'page': 9})
+        self.assertAsyncMatches(f'/listing/products/{self.product.id}/', f'/listing/async/products/{self.product.id}/')
+        self.assertAsyncMatches('/listing/products/0/', '/listing/async/products/0/')
+        self.assertAsyncMatches(f'/listing/product/{self.product.id}/reviews/', f'/listing/async/product/{self.product.id}/reviews/')
+
+    async def test_async_middleware_stack(self):
+        # the middleware hooks run in separate contexts under ASGI
+        response = await self.async_client.get(f'/listing/async/products/{self.product.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], self.product.name)
+
+    def test_sparse_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/listing/products/', {'fields': 'name,price'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'name', 'price'})
+        self.assertNotIn('about', queries.captured_queries[-1]['sql'])
+
+    def test_expand_shop(self):
+        response = self.assertQueryBudget(2, 'get', '/listing/products/', {'expand': 'shop,category'})
+        product = response.json()['results'][0]
+        self.assertEqual(product['shop']['name'], self.data['shop'].name)
+        self.assertEqual(product['category']['name'], self.data['category'].name)
+
+    def test_unknown_field(self):
+        self.assertEqual(self.client.get('/listing/products/', {'fields': 'secret'}).status_code, 400)
+        self.assertEqual(self.client.get('/listing/products/', {'expand': 'about'}).status_code, 400)
+
+    def test_edit_product(self):
+        self.assertQueryBudget(
+            7, 'post', '/listing/product/edit/',
+            {'user_id': self.data['seller'].user_id, 'product_id': self.product.id, 'price': '99.00'},
+            content_type='application/json',
+        )
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ResponseCacheTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+        cls.product = cls.data['products'][0]
+
+    def test_cached_product_is_invalidated_on_edit(self):
+        path = f'/listing/products/{self.product.id}/'
+        self.assertEqual(self.client.get(path)['X-Cache'], 'MISS')
+        response = self.assertQueryBudget(0, 'get', path)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/listing/product/edit/', {
+                'user_id': self.data['seller'].user_id, 'product_id': self.product.id, 'price': '99.00',
+            }, content_type='application/json')
+        response = self.client.get(path)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['price'], '99.00')
+
+    def test_category_move_invalidates_filtered_lists(self):
+        other = Category.objects.create(name='Langra')
+        path = f'/listing/products/?category_id={other.id}'
+        self.assertEqual(self.client.get(path).json()['results'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/listing/product/edit/', {
+                'user_id': self.data['seller'].user_id, 'product_id': self.product.id, 'category': other.id,
+            }, content_type='application/json')
+        response = self.client.get(path)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.product.id])
+
+    def test_new_review_invalidates_review_list(self):
+        path = f'/listing/product/{self.product.id}/reviews/'
+        count = len(self.client.get(path).json())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(path, {'user_id': self.data['customer'].user_id, 'rating': 4, 'content': 'Nice'})
+        self.assertEqual(len(self.client.get(path).json()), count + 1)
+
+
+@override_settings(CATALOG_CHANGES_SETTLE=0, CATALOG_CHANGES_PAGE_SIZE=2)
+class ProductChangesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def sync(self, cursor=None):
+        """Follows has_more, returns (products by id, deleted ids, cursor)."""
+        products, deleted = {}, []
+        while True:
+            body = self.client.get('/listing/products/changes/', {'cursor': cursor} if cursor else {}).json()
+            products.update((product['id'], product) for product in body['products'])
+            deleted += body['deleted']
+            cursor = body['next_cursor']
+            if not body['has_more']:
+                return products, deleted, cursor
+
+    def test_full_then_incremental_sync(self):
+        products, deleted, cursor = self.sync()
+        self.assertEqual(sorted(products), sorted(p.id for p in self.data['products']))
+        self.assertEqual(products[self.data['products'][0].id], ProductSerializer(self.data['products'][0]).data)
+        self.assertEqual(self.sync(cursor)[:2], ({}, []))
+
+        changed, removed = self.data['products'][1], self.data['products'][2]
+        seller_user_id = self.data['seller'].user_id
+        self.client.post('/listing/product/edit/', {'user_id': seller_user_id, 'product_id': changed.id, 'price': '99.00'},
+                         content_type='application/json')
+        self.client.post('/listing/product/delete/', {'user_id': seller_user_id, 'product_id': removed.id},
+                         content_type='application/json')
+
+        products, deleted, _ = self.sync(cursor)
+        self.assertEqual(list(products), [changed.id])
+        self.assertEqual(products[changed.id]['price'], '99.00')
+        self.assertEqual(deleted, [removed.id])
+
+    def test_bad_cursors(self):
+        self.assertEqual(self.client.get('/listing/products/changes/', {'cursor': 'nonsense'}).status_code, 400)
+        old = timezone.now() - timedelta(days=settings.CATALOG_TOMBSTONE_DAYS + 1)
+        expired = encode_cursor((old, 0), (old, 0))
+        self.assertEqual(self.client.get('/listing/products/changes/', {'cursor': expired}).status_code, 410)
+
+
+class CatalogSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def setUp(self):
+        self.catalog_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.catalog_dir)
+        settings_override = override_settings(
+            CATALOG_SNAPSHOT_DIR=self.catalog_dir, CATALOG_SNAPSHOT_PAGE_SIZE=2, RESPONSE_CACHE_ENABLED=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        call_command('build_catalog', stdout=io.StringIO())
+
+    def fetch(self, path, **extra):
+        response = self.client.get(path, **extra)
+        body = json.loads(b''.join(response.streaming_content)) if response.status_code == 200 else None
+        return response, body
+
+    def test_served_from_disk(self):
+        product = self.data['products'][0]
+        with self.assertNumQueries(0):
+            response, body = self.fetch(f'/catalog/products/{product.id}.json')
+        self.assertEqual(body, self.client.get(f'/listing/products/{product.id}/').json())
+        self.assertEqual(self.client.get(f'/catalog/products/{product.id}.json', HTTP_IF_NONE_MATCH=f"W/{response['ETag']}").status_code, 304)
+
+        category_id = self.data['category'].id
+        pages = [self.fetch(f'/catalog/categories/{category_id}/{n}.json')[1] for n in (1, 2, 3)]
+        self.assertEqual([p['id'] for page in pages for p in page['results']], [p.id for p in self.data['products']])
+        self.assertEqual(pages[0]['next'], f'/catalog/categories/{category_id}/2.json')
+        self.assertIsNone(pages[2]['next'])
+
+    def test_writes_rewrite_affected_files(self):
+        seller_user_id, category_id = self.data['seller'].user_id, self.data['category'].id
+        first, last = self.data['products'][0], self.data['products'][-1]
+        etag = self.client.get(f'/catalog/categories/{category_id}/2.json')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/listing/product/edit/', {'user_id': seller_user_id, 'product_id': last.id, 'price': '99.00'},
+                             content_type='application/json')
+        self.assertEqual(self.fetch(f'/catalog/products/{last.id}.json')[1]['price'], '99.00')
+        self.assertEqual(self.fetch(f'/catalog/shops/{last.shop_id}/3.json')[1]['results'][0]['price'], '99.00')
+        self.assertEqual(self.client.get(f'/catalog/categories/{category_id}/2.json')['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/listing/product/delete/', {'user_id': seller_user_id, 'product_id': first.id},
+                             content_type='application/json')
+        self.assertEqual(self.client.get(f'/catalog/products/{first.id}.json').status_code, 404)
+        self.assertEqual(self.client.get(f'/catalog/categories/{category_id}/3.json').status_code, 404)
+        self.assertIsNone(self.fetch(f'/catalog/categories/{category_id}/2.json')[1]['next'])
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, *args):
+        call_command(
+            'generate_dataset', '--sellers', '2', '--customers', '3', '--categories', '2', '--products', '5',
+            '--orders', '20', '--reviews', '5', *args, stdout=io.StringIO(),
+        )
+
+    def test_rows_are_dated_from_start(self):
+        self.generate('--start', '2024-03-01', '--days', '10')
+        start = datetime(2024, 3, 1, tzinfo=dt_timezone.utc)
+        dates = Order.objects.values_list('created_at', flat=True)
+        self.assertEqual(len(dates), 20)
+        self.assertTrue(all(start <= date < start + timedelta(days=10) for date in dates))
+
+    def test_every_product_needs_a_shop_and_category(self):
+        for option in ('--sellers', '--categories'):
+            with self.assertRaisesMessage(CommandError, 'must be at least 1'):
+                self.generate(option, '0')
+
+
+class RelatedProductTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+        user = User.objects.create_user('second', email='second@example.com', password='second-password')
+        cls.second = Customer.objects.create(user=user, full_address='Khulna')
+
+    def complete(self, customer, product):
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(product=product, customer=customer, quantity=1, total_price=product.price, status='Completed')
+
+    def related(self, product):
+        return [p['id'] for p in self.client.get(f'/listing/product/{product.id}/related/').json()]
+
+    def test_completed_orders_pair_products(self):
+        p0, p1, p2, p3 = self.data['products'][:4]
+        for product in (p0, p1, p2):
+            self.complete(self.data['customer'], product)
+        # a repeat purchase doesn't count the customer twice
+        self.complete(self.data['customer'], p1)
+        self.complete(self.second, p2)
+        self.complete(self.second, p0)
+        Order.objects.filter(product=p3).update(status='Cancelled')
+
+        self.assertEqual(self.related(p0), [p2.id, p1.id])
+        self.assertEqual(self.related(p3), [])
+        with self.assertNumQueries(1):
+            self.client.get(f'/listing/product/{p1.id}/related/')
+
+        incremental = set(RelatedProduct.objects.values_list('product_id', 'related_id', 'customers'))
+        call_command('rebuild_related_products', stdout=io.StringIO())
+        self.assertEqual(set(RelatedProduct.objects.values_list('product_id', 'related_id', 'customers')), incremental)
+
+
+class RankingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def order(self, product, count, days_ago=0):
+        for _ in range(count):
+            order = Order.objects.create(product=product, customer=self.data['customer'], quantity=1, total_price=product.price)
+            Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=days_ago))
+
+    def ranked(self, **params):
+        return [p['id'] for p in self.client.get('/listing/trending/', params).json()]
+
+    def test_refresh_ranks_recent_activity(self):
+        p0, p1, p2, p3, p4 = self.data['products']
+        self.order(p1, 20, days_ago=20)
+        self.order(p3, 3)
+        Product.objects.filter(id=p2.id).update(sold=50)
+        call_command('refresh_rankings', stdout=io.StringIO())
+
+        trending = self.ranked()
+        self.assertEqual(trending[0], p3.id)
+        self.assertEqual(self.ranked(category_id=self.data['category'].id), trending)
+        self.assertEqual(self.ranked(kind='bestseller', limit=1), [p2.id])
+
+        self.order(p4, 5)
+        call_command('refresh_rankings', stdout=io.StringIO())
+        incremental = self.ranked()
+        self.assertEqual(incremental[:2], [p4.id, p3.id])
+        call_command('refresh_rankings', '--full', stdout=io.StringIO())
+        self.assertEqual(self.ranked(), incremental)
+
+        with self.assertNumQueries(1):
+            self.client.get('/listing/trending/', {'limit': 3})
+        self.assertEqual(self.client.get('/listing/trending/', {'kind': 'newest'}).status_code, 400)
@@ -1,15 +1,25 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from listing.views import CategoryViewSet, ProductViewSet, AddProductAPIView, DeleteProductAPIView, EditProductAPIView, ReviewListCreateView
+from listing.views import ProductChangesAPIView, RankingListView, RelatedProductListView
+from listing.views import async_category_list, async_product_list, async_product_detail, async_review_list
 
 router = DefaultRouter()
 router.register('categories', CategoryViewSet)
 router.register('products', ProductViewSet)
 
 urlpatterns = [
+    # ahead of the router, whose products/<pk>/ would take it
+    path('products/changes/', ProductChangesAPIView.as_view(), name='product_changes'),
     path('', include(router.urls)),
     path('product/add/', AddProductAPIView.as_view(), name='add_product'),
     path('product/delete/', DeleteProductAPIView.as_view(), name='delete_product'),
     path('product/edit/', EditProductAPIView.as_view(), name='edit_product'),
     path('product/<int:prod_id>/reviews/', ReviewListCreateView.as_view(), name='list_create_review'),
+    path('product/<int:prod_id>/related/', RelatedProductListView.as_view(), name='related_products'),
+    path('trending/', RankingListView.as_view(), name='trending'),
+    path('async/categories/', async_category_list, name='async_category_list'),
+    path('async/products/', async_product_list, name='async_product_list'),
+    path('async/products/<int:pk>/', async_product_detail, name='async_product_detail'),
+    path('async/product/<int:prod_id>/reviews/', async_review_list, name='async_review_list'),
 ]
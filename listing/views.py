@@ -1,5 +1,13 @@
+import base64
+import binascii
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
 from django.shortcuts import render
-from listing.models import Category, Product, Review
+from django.utils import timezone
+from listing.models import Category, Product, ProductRanking, ProductTombstone, Review
 from listing.serializers import CategorySerializer, ProductSerializer, AddProductSerializer, ReviewSerializer
 from rest_framework import viewsets, views, generics
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
@@ -8,21 +16,58 @@ from shop.models import Shop
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from users.models import Seller, Customer
+from users.serializers import CustomerSerializer
+from shop.serializers import ShopSerializer
 from django.contrib.auth.models import User
 from shop.models import Shop
 from rest_framework.authentication import TokenAuthentication
-
-
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+from JuicyCart_Tropicals.mixins import BatchRetrieveMixin, FastListMixin, SparseFieldsMixin
+from JuicyCart_Tropicals.cache import CachedResponseMixin
+from JuicyCart_Tropicals.async_views import detail_response, list_response, paginated_response, throttled
+from JuicyCart_Tropicals.readers import row_reader
+from JuicyCart_Tropicals.routers import primary_reads
+from django.views.decorators.http import require_GET
+
+
+def filter_categories(queryset, params):
+    category_id = params.get('category_id')
+    if category_id:
+        queryset = queryset.filter(id = category_id)
+    return queryset
+
+
+def filter_products(queryset, params):
+    # Get filter parameters from the request
+    product_id = params.get('product_id')
+    category_id = params.get('category_id')
+    name = params.get('name')
+    min_price = params.get('min_price')
+    max_price = params.get('max_price')
+    shop_id = params.get('shop_id')
+
+    # Apply filters if parameters are provided
+    if product_id:
+        queryset = queryset.filter(id=product_id)
+    if category_id:
+        queryset = queryset.filter(category__id=category_id)
+    if name:
+        queryset = queryset.filter(name__icontains=name)  # Case-insensitive search
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price:
+        queryset = queryset.filter(price__lte=max_price)
+    if shop_id:
+        queryset = queryset.filter(shop__id=shop_id)
+
+    return queryset
+
+
+class CategoryViewSet(CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        category_id = self.request.query_params.get('category_id')
-        if category_id:
-            queryset = queryset.filter(id = category_id)
-        return queryset
+        return filter_categories(super().get_queryset(), self.request.query_params)
 
 
 class ProductPagination(PageNumberPagination):
@@ -30,37 +75,18 @@ class ProductPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(SparseFieldsMixin, CachedResponseMixin, BatchRetrieveMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     pagination_class = ProductPagination
+    expandable_fields = {'shop': ShopSerializer, 'category': CategorySerializer}
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        
-        # Get filter parameters from the request
-        product_id = self.request.query_params.get('product_id')
-        category_id = self.request.query_params.get('category_id')
-        name = self.request.query_params.get('name')
-        min_price = self.request.query_params.get('min_price')
-        max_price = self.request.query_params.get('max_price')
-        shop_id = self.request.query_params.get('shop_id')
-
-        # Apply filters if parameters are provided
-        if product_id:
-            queryset = queryset.filter(id=product_id)
-        if category_id:
-            queryset = queryset.filter(category__id=category_id)
-        if name:
-            queryset = queryset.filter(name__icontains=name)  # Case-insensitive search
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        if max_price:
-            queryset = queryset.filter(price__lte=max_price)
-        if shop_id:
-            queryset = queryset.filter(shop__id=shop_id)
+        return filter_products(super().get_queryset(), self.request.query_params)
 
-        return queryset
+    def get_throttle_scope(self):
+        # name searches are icontains scans, browsing is mostly served from the response cache
+        return 'search' if self.request.query_params.get('name') else None
 
 
 class AddProductAPIView(views.APIView):
@@ -116,6 +142,80 @@ class DeleteProductAPIView(views.APIView):
         return Response({"success": "Product deleted successfully."})
 
 
+def encode_cursor(products_after, deleted_after):
+    position = [[moment.isoformat(), pk] for moment, pk in (products_after, deleted_after)]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """((updated_at, id) of the last product sent, (deleted_at, id) of the last tombstone sent)."""
+    position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    products_after, deleted_after = [(datetime.fromisoformat(moment), int(pk)) for moment, pk in position]
+    if timezone.is_naive(products_after[0]) or timezone.is_naive(deleted_after[0]):
+        raise ValueError("cursor times carry a timezone")
+    return products_after, deleted_after
+
+
+def after(field, position):
+    moment, pk = position
+    return Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+
+
+class ProductChangesAPIView(views.APIView):
+    """
+    Products created or changed and ids of products deleted since `?cursor=`,
+    oldest first. Without a cursor it returns the whole catalog, page by page.
+    Clients upsert `products`, then drop `deleted`, keep `next_cursor` and ask
+    again right away while `has_more` is true. `?shop_id=` limits both to a shop.
+    """
+
+    def get(self, request):
+        now = timezone.now()
+        settled = now - timedelta(seconds=settings.CATALOG_CHANGES_SETTLE)
+        cursor = request.query_params.get('cursor')
+        if cursor:
+            try:
+                products_after, deleted_after = decode_cursor(cursor)
+            except (ValueError, TypeError, binascii.Error):
+                raise ValidationError({"error": "Invalid cursor."})
+            if deleted_after[0] < now - timedelta(days=settings.CATALOG_TOMBSTONE_DAYS):
+                return Response({"error": "Cursor expired, sync from scratch."}, status=410)
+        else:
+            products_after, deleted_after = None, (settled, 0)
+
+        products = Product.objects.filter(updated_at__lte=settled)
+        deleted = ProductTombstone.objects.filter(after('deleted_at', deleted_after), deleted_at__lte=settled)
+        if products_after:
+            products = products.filter(after('updated_at', products_after))
+        shop_id = request.query_params.get('shop_id')
+        if shop_id:
+            products, deleted = products.filter(shop_id=shop_id), deleted.filter(shop_id=shop_id)
+
+        size = settings.CATALOG_CHANGES_PAGE_SIZE
+        # a lagging replica would let the cursor move past rows it hasn't received yet
+        with primary_reads():
+            reader = row_reader(ProductSerializer()) if settings.FAST_READ_ENABLED else None
+            if reader is not None:
+                columns, to_dict = reader
+                rows = list(products.order_by('updated_at', 'id').values_list('updated_at', 'id', *columns)[:size + 1])
+                changed = [to_dict(row[2:]) for row in rows[:size]]
+            else:
+                instances = list(products.order_by('updated_at', 'id')[:size + 1])
+                rows = [(product.updated_at, product.id) for product in instances]
+                changed = ProductSerializer(instances[:size], many=True).data
+            tombstones = list(deleted.order_by('deleted_at', 'id').values_list('deleted_at', 'id', 'product_id')[:size + 1])
+
+        # a short page means everything up to `settled` was sent, the next sync can start there
+        products_after = tuple(rows[size - 1][:2]) if len(rows) > size else (settled, 0)
+        deleted_after = tuple(tombstones[size - 1][:2]) if len(tombstones) > size else (settled, 0)
+        return Response({
+            "products": changed,
+            "deleted": [product_id for _, _, product_id in tombstones[:size]],
+            "next_cursor": encode_cursor(products_after, deleted_after),
+            "has_more": len(rows) > size or len(tombstones) > size,
+        })
+
+
 class EditProductAPIView(views.APIView):
     def post(self, request):
         user_id = request.data.get('user_id')
@@ -150,8 +250,12 @@ class EditProductAPIView(views.APIView):
         return Response(serializer.errors, status=400)
 
 
-class ReviewListCreateView(generics.ListCreateAPIView):
+class ReviewListCreateView(SparseFieldsMixin, CachedResponseMixin, FastListMixin, generics.ListCreateAPIView):
     serializer_class = ReviewSerializer
+    expandable_fields = {'user': CustomerSerializer, 'product': ProductSerializer}
+
+    def get_cache_tags(self, data):
+        return [f"product:{self.kwargs['prod_id']}:reviews"] + self.expanded_cache_tags(data)
 
     def get_queryset(self):
         prod_id = self.kwargs.get('prod_id')
@@ -176,3 +280,71 @@ class ReviewListCreateView(generics.ListCreateAPIView):
         serializer.save(user=user.customer, product=product)
         return Response({"success" : "Review Added!"})
 
+
+class RelatedProductListView(SparseFieldsMixin, FastListMixin, generics.ListAPIView):
+    """Products most often bought by the customers who bought this one, best first."""
+    serializer_class = ProductSerializer
+    expandable_fields = {'shop': ShopSerializer, 'category': CategorySerializer}
+
+    def get_queryset(self):
+        # one read of the (product, -customers) index, joined to the products
+        return (
+            Product.objects.filter(bought_with__product_id=self.kwargs['prod_id'])
+            .order_by('-bought_with__customers', 'id')[:settings.RELATED_PRODUCTS_LIMIT]
+        )
+
+
+class RankingListView(SparseFieldsMixin, FastListMixin, generics.ListAPIView):
+    """
+    The top products by `?kind=trending` (default) or `bestseller`, in a
+    `?category_id=` or the whole catalog, at most `?limit=` (RANKING_SIZE).
+    Rankings are as of the last refresh_rankings run.
+    """
+    serializer_class = ProductSerializer
+    expandable_fields = {'shop': ShopSerializer, 'category': CategorySerializer}
+
+    def get_queryset(self):
+        params = self.request.query_params
+        kind = params.get('kind', 'trending')
+        if kind not in dict(ProductRanking.KIND_CHOICES):
+            raise ValidationError({"error": f"Unknown kind: {kind}. Use trending or bestseller."})
+        try:
+            limit = min(int(params.get('limit', settings.RANKING_SIZE)), settings.RANKING_SIZE)
+            category_id = int(params['category_id']) if params.get('category_id') else None
+        except ValueError:
+            raise ValidationError({"error": "limit and category_id must be integers."})
+
+        # a range of the (kind, category, rank) index, joined to the products
+        return (
+            Product.objects.filter(rankings__kind=kind, rankings__category_id=category_id)
+            .order_by('rankings__rank')[:max(limit, 0)]
+        )
+
+
+# Async twins of the hot read endpoints, for ASGI deployments. Same filters
+# and same response bytes as the viewsets above, without the response cache,
+# ?fields= or ?expand=, throttled by the same buckets.
+
+@require_GET
+@throttled()
+async def async_category_list(request):
+    return await list_response(filter_categories(Category.objects.all(), request.GET), CategorySerializer)
+
+
+@require_GET
+@throttled(lambda request: 'search' if request.GET.get('name') else None)
+async def async_product_list(request):
+    queryset = filter_products(Product.objects.all(), request.GET)
+    return await paginated_response(request, queryset, ProductSerializer, ProductPagination)
+
+
+@require_GET
+@throttled()
+async def async_product_detail(request, pk):
+    return await detail_response(Product.objects.all(), pk, ProductSerializer)
+
+
+@require_GET
+@throttled()
+async def async_review_list(request, prod_id):
+    return await list_response(Review.objects.filter(product_id=prod_id), ReviewSerializer)
@@ -16,5 +16,17 @@ class Order(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # lets order.signals tell a status change from another save without a query
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # after the post_save receivers, which all compare against the status as loaded
+        self._loaded_status = self.__dict__.get('status')
+
     def __str__(self):
         return f"Order {self.id} - {self.product.name} for {self.customer.user.username} | status: {self.status}"
@@ -1,12 +1,22 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from order.models import Order
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from order.serializers import OrderSerializer
+from JuicyCart_Tropicals.cache import invalidate_tags
+from JuicyCart_Tropicals.events import broker
+from JuicyCart_Tropicals.renderers import FastJSONRenderer
+from JuicyCart_Tropicals.metrics import EMAIL_SEND_LATENCY
+from listing.recommendations import record_purchase
+from listing.signals import deleted_with_product, product_shop_id
 
 
 @receiver(post_save, sender=Order)
 def send_order_status_email(sender, instance, created, **kwargs):
+    # the mail and template stack is loaded on the first order, not on every cold start
+    from django.core.mail import EmailMultiAlternatives
+    from django.template.loader import render_to_string
+
     if created:
         subject = "Order Placed Successfully"
         template = 'order/order_placed.html'
@@ -26,4 +36,35 @@ def send_order_status_email(sender, instance, created, **kwargs):
     email_body = render_to_string(template, message_context)
     email = EmailMultiAlternatives(subject, '', to=[instance.customer.user.email])
     email.attach_alternative(email_body, 'text/html')
-    email.send()
+    with EMAIL_SEND_LATENCY.labels(template).time():
+        email.send()
+
+
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_cached_dashboard(sender, instance, origin=None, **kwargs):
+    if not deleted_with_product(origin):
+        invalidate_tags(f'shop:{product_shop_id(instance, origin)}:dashboard')
+
+
+@receiver(post_save, sender=Order)
+def record_co_purchase(sender, instance, created, **kwargs):
+    if instance.status != 'Completed' or getattr(instance, '_loaded_status', None) == 'Completed':
+        return
+    customer_id, product_id = instance.customer_id, instance.product_id
+    # recommendations must not fail the status change
+    transaction.on_commit(lambda: record_purchase(customer_id, product_id), robust=True)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_event(sender, instance, created, **kwargs):
+    if created:
+        event_type = 'order.created'
+    elif instance.status != getattr(instance, '_loaded_status', None):
+        event_type = 'order.status'
+    else:
+        return
+
+    data = FastJSONRenderer().render(OrderSerializer(instance).data).decode()
+    channels = [f'shop:{product_shop_id(instance)}', f'customer:{instance.customer_id}']
+    # subscribers may read the order right away, it has to be committed first
+    transaction.on_commit(lambda: broker().publish(channels, event_type, data))
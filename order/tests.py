@@ -1,3 +1,130 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from JuicyCart_Tropicals.events import CacheBroker, broker, check_broker
+from JuicyCart_Tropicals.testing import FastReadMixin, QueryBudgetMixin, create_marketplace
+from order.models import Order
+from order.signals import record_co_purchase
+
+
+class OrderQueryBudgetTests(FastReadMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+        cls.customer_id = cls.data['customer'].user_id
+        cls.order = Order.objects.first()
+
+    def test_order_list(self):
+        self.assertQueryBudget(1, 'get', '/order/list/', {'customer_id': self.customer_id})
+
+    def test_order_list_by_shop(self):
+        self.assertQueryBudget(1, 'get', '/order/list/', {'shop_id': self.data['shop'].id})
+
+    def test_fast_order_list(self):
+        self.assertFastReadMatches('/order/list/', {'shop_id': self.data['shop'].id})
+
+    def test_async_order_list(self):
+        self.assertAsyncMatches('/order/list/', '/order/async/list/', {'customer_id': self.customer_id})
+
+    def test_order_list_expanded(self):
+        response = self.assertQueryBudget(1, 'get', '/order/list/', {'customer_id': self.customer_id, 'expand': 'product,customer'})
+        order = response.json()[0]
+        self.assertEqual(order['product']['id'], self.order.product_id)
+        self.assertEqual(order['customer']['user'], self.customer_id)
+
+    def test_change_order_status(self):
+        self.assertQueryBudget(9, 'post', '/order/change/', {
+            'user_id': self.data['seller'].user_id, 'customer_id': self.customer_id,
+            'order_id': self.order.id, 'order_status': 'Completed',
+        })
+
+    def test_cancel_order(self):
+        self.assertQueryBudget(8, 'post', '/order/cancel/', {'user_id': self.customer_id, 'order_id': self.order.id})
+
+    def test_signals_do_not_load_products(self):
+        product = self.data['products'][0]
+        Order.objects.bulk_create([Order(product=product, customer=self.data['customer'], quantity=1) for _ in range(5)])
+        order = Order.objects.filter(product=product).first()
+        with CaptureQueriesContext(connection) as queries:
+            order.status = 'Completed'
+            order.save()
+            # cascades to the orders and reviews, the product's own receivers cover the dashboard
+            product.delete()
+        product_reads = [q['sql'] for q in queries if q['sql'].startswith('SELECT') and 'FROM "listing_product"' in q['sql']]
+        # the saved order's shop, once for its two receivers
+        self.assertEqual(len(product_reads), 1)
+
+
+@override_settings(EVENT_STREAM_TIMEOUT=0.2, EVENT_HEARTBEAT=0.1)
+class OrderEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace(products=1, orders=0)
+
+    def place_and_complete_order(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(product=self.data['products'][0], customer=self.data['customer'], quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.get(pk=order.pk)
+            order.save()  # same status, no event
+            order.status = 'Completed'
+            order.save()
+        return order
+
+    def test_stream_resumes_after_last_event_id(self):
+        last_id = broker().last_id()
+        order = self.place_and_complete_order()
+
+        response = self.client.get('/order/events/', {'shop_id': self.data['shop'].id}, HTTP_LAST_EVENT_ID=str(last_id))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn(f'id: {last_id + 1}\nevent: order.created\ndata: {{"id":{order.id},', body)
+        self.assertIn(f'id: {last_id + 2}\nevent: order.status\n', body)
+        self.assertNotIn(f'id: {last_id + 3}', body)
+
+        resumed = self.client.get('/order/events/', {'shop_id': self.data['shop'].id, 'last_event_id': last_id + 1})
+        self.assertNotIn('order.created', b''.join(resumed.streaming_content).decode())
+
+    async def test_async_stream_gets_events_of_its_channels_only(self):
+        last_id = broker().last_id()
+        broker().publish(['customer:0'], 'order.created', '{}')
+        broker().publish([f'customer:{self.data["customer"].pk}'], 'order.status', '{}')
+
+        response = await self.async_client.get('/order/events/', {'customer_id': self.data['customer'].pk, 'last_event_id': last_id})
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertNotIn('order.created', body)
+        self.assertIn(f'id: {last_id + 2}\nevent: order.status', body)
+
+    def test_receivers_see_the_status_as_loaded(self):
+        # publish_order_event ahead of record_co_purchase, both compare against the status before the save
+        post_save.disconnect(record_co_purchase, sender=Order)
+        post_save.connect(record_co_purchase, sender=Order)
+        self.addCleanup(post_save.connect, record_co_purchase, sender=Order)
+        with mock.patch('order.signals.record_purchase') as record_purchase:
+            order = self.place_and_complete_order()
+            with self.captureOnCommitCallbacks(execute=True):
+                order.save()  # still completed, not a second purchase
+        record_purchase.assert_called_once_with(order.customer_id, order.product_id)
+
+    def test_channel_is_required(self):
+        self.assertEqual(self.client.get('/order/events/').status_code, 400)
+
+    def test_cache_broker(self):
+        cache.clear()
+        shared = CacheBroker()
+        first = shared.publish(['shop:1'], 'order.created', '{"id":1}')
+        shared.publish(['shop:2'], 'order.created', '{"id":2}')
+        events, after = shared.events(['shop:1'], 0)
+        self.assertEqual([event.id for event in events], [first])
+        self.assertEqual(after, shared.last_id())
+        self.assertEqual(shared.wait(['shop:1'], after, timeout=0), ([], after))
+
+    def test_deploy_check_flags_unshared_brokers(self):
+        self.assertEqual([warning.id for warning in check_broker(None)], ['events.W001'])
+        with override_settings(EVENT_BROKER='JuicyCart_Tropicals.events.CacheBroker'):
+            # the default cache is locmem here
+            self.assertEqual([warning.id for warning in check_broker(None)], ['events.W002'])
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from order.views import OrderViewSet, CancelOrderAPIView, ChangeOrderStatusAPIView, PaymentViewSet
+from order.views import OrderViewSet, CancelOrderAPIView, ChangeOrderStatusAPIView, PaymentViewSet, async_order_list, order_events
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -13,4 +13,6 @@ urlpatterns = [
     path('payment/cancel/', PaymentViewSet.as_view({'post': 'cancel'}), name='payment_cancel'),
     path('cancel/', CancelOrderAPIView.as_view(), name='cancel_order'),
     path('change/', ChangeOrderStatusAPIView.as_view(), name='change_order_status'),
+    path('async/list/', async_order_list, name='async_order_list'),
+    path('events/', order_events, name='order_events'),
 ]
\ No newline at end of file
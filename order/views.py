@@ -11,7 +11,6 @@ from listing.models import Product
 from django.db import transaction
 from users.models import Customer, Seller
 from django.contrib.auth.models import User
-from sslcommerz_lib import SSLCOMMERZ
 from rest_framework.authentication import TokenAuthentication
 import random 
 import string
@@ -20,33 +19,72 @@ from django.http import HttpResponse
 import uuid
 from django.conf import settings
 from rest_framework.decorators import action
+from JuicyCart_Tropicals.metrics import GATEWAY_LATENCY
+from JuicyCart_Tropicals.mixins import FastListMixin, SparseFieldsMixin
+from JuicyCart_Tropicals.async_views import json_response, list_response, throttled
+from JuicyCart_Tropicals.events import stream_response
+from django.views.decorators.http import require_GET
+from listing.serializers import ProductSerializer
+from users.serializers import CustomerSerializer
+import time
+
+
+def filter_orders(queryset, params):
+    order_id = params.get('order_id')
+    shop_id = params.get('shop_id')
+    customer_id = params.get('customer_id')
+
+    if order_id:
+        queryset = queryset.filter(id=order_id)
+    if shop_id:
+        queryset = queryset.filter(product__shop__id=shop_id)
+    if customer_id:
+        queryset = queryset.filter(customer=customer_id)
+    
+    return queryset
 
 
 class SpecificOrder(BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
-        order_id = request.query_params.get('order_id')
-        shop_id = request.query_params.get('shop_id')
-        customer_id = request.query_params.get('customer_id')
-
-        if order_id:
-            queryset = queryset.filter(id=order_id)
-        if shop_id:
-            queryset = queryset.filter(product__shop__id=shop_id)
-        if customer_id:
-            queryset = queryset.filter(customer=customer_id)
-        
-        return queryset
+        return filter_orders(queryset, request.query_params)
 
 
-class OrderViewSet(viewsets.ReadOnlyModelViewSet):
+class OrderViewSet(SparseFieldsMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = OrderSerializer
     queryset = Order.objects.all()
     filter_backends = [SpecificOrder]
+    expandable_fields = {'product': ProductSerializer, 'customer': CustomerSerializer}
+
+
+@require_GET
+@throttled()
+async def async_order_list(request):
+    return await list_response(filter_orders(Order.objects.all(), request.GET), OrderSerializer)
+
+
+@require_GET
+def order_events(request):
+    # the same filters as the order list, so a client can switch from polling it
+    channels = []
+    if request.GET.get('shop_id'):
+        channels.append(f"shop:{request.GET['shop_id']}")
+    if request.GET.get('customer_id'):
+        channels.append(f"customer:{request.GET['customer_id']}")
+    if not channels:
+        return json_response({"error": "shop_id or customer_id is required."}, status=400)
+    return stream_response(request, channels)
 
 
 class PaymentViewSet(viewsets.ViewSet):
+    def get_throttle_scope(self):
+        # success/fail/cancel are the gateway calling back
+        return 'payment' if self.action == 'create_payment' else None
+
     @action(detail=False, methods=['post'])
     def create_payment(self, request):
+        # imported here, the gateway client pulls in requests/urllib3 which only checkout needs
+        from sslcommerz_lib import SSLCOMMERZ
+
         # SSLCommerz configuration
         sslcz_settings = {
             'store_id': 'juicy67a80e7052c5e',
@@ -121,15 +159,19 @@ class PaymentViewSet(viewsets.ViewSet):
             'product_profile': "general"
         }
 
+        started = time.perf_counter()
         try:
             response = sslcz.createSession(post_body)
             if response.get('status') == 'SUCCESS' and 'GatewayPageURL' in response:
+                GATEWAY_LATENCY.labels('success').observe(time.perf_counter() - started)
                 return Response({"url": response['GatewayPageURL']})
+            GATEWAY_LATENCY.labels('rejected').observe(time.perf_counter() - started)
             return Response({"error": "Unable to create payment session"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
         except User.DoesNotExist:
             return Response({"error": "User does not exist"}, status=status.HTTP_404_NOT_FOUND)
         except Exception:
+            GATEWAY_LATENCY.labels('error').observe(time.perf_counter() - started)
             return Response({"error": "Internal Server Error"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['post'])
@@ -192,7 +234,7 @@ class CancelOrderAPIView(views.APIView):
             raise PermissionDenied("You are not authorized to cancel orders.")
 
         try:
-            order = Order.objects.get(id=order_id, customer=user.customer)
+            order = Order.objects.select_related('product', 'customer__user').get(id=order_id, customer=user.customer)
         except Order.DoesNotExist:
             raise ValidationError({"error": "Order not found or does not belong to you."})
 
@@ -233,7 +275,7 @@ class ChangeOrderStatusAPIView(views.APIView):
             raise PermissionDenied("seller does not exists.")
 
         try:
-            order = Order.objects.get(id=order_id, customer=customer_user.customer)
+            order = Order.objects.select_related('product', 'customer__user').get(id=order_id, customer=customer_user.customer)
         except Order.DoesNotExist:
             raise ValidationError({"error": "Order not found or does not belong to this customer."})
 
@@ -0,0 +1,9 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from shop.models import Shop
+from JuicyCart_Tropicals.cache import invalidate_instance
+
+
+@receiver([post_save, post_delete], sender=Shop)
+def invalidate_cached_shop(sender, instance, signal, created=False, **kwargs):
+    invalidate_instance(instance, membership_changed=created or signal is post_delete)
@@ -1,3 +1,56 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from JuicyCart_Tropicals.testing import FastReadMixin, QueryBudgetMixin, create_marketplace
+from listing.models import Product
+from shop.models import Shop
+from users.models import Seller
 
-# Create your tests here.
+
+class ShopQueryBudgetTests(FastReadMixin, QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def test_shop_list(self):
+        self.assertQueryBudget(1, 'get', '/shop/list/', {'shop_id': self.data['shop'].id})
+
+    def test_fast_shop_list(self):
+        self.assertFastReadMatches('/shop/list/')
+
+    def test_async_shop_list(self):
+        self.assertAsyncMatches('/shop/list/', '/shop/async/list/', {'user_id': self.data['seller'].user_id})
+
+    def test_dashboard(self):
+        self.assertQueryBudget(6, 'post', '/shop/dashboard/', {'user_id': self.data['seller'].user_id})
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_seller_edit_invalidates_expanded_shops(self):
+        seller = self.data['seller']
+        path = f"/shop/list/{self.data['shop'].id}/"
+        self.assertEqual(self.client.get(path, {'expand': 'owner'}).json()['owner']['mobile_no'], seller.mobile_no)
+
+        seller.mobile_no = '01800000000'
+        with self.captureOnCommitCallbacks(execute=True):
+            seller.save()
+        response = self.client.get(path, {'expand': 'owner'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['owner']['mobile_no'], '01800000000')
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_moved_product_invalidates_both_dashboards(self):
+        other_user = User.objects.create_user('grower', password='grower-password')
+        other = Seller.objects.create(user=other_user, mobile_no='01900000000', full_address='Chapainawabganj')
+        other_shop = Shop.objects.create(owner=other, name='Mango Garden', description='Langra', location='Chapainawabganj')
+
+        def product_counts():
+            return [
+                self.client.post('/shop/dashboard/', {'user_id': user_id}).json()['product_count']
+                for user_id in (self.data['seller'].user_id, other_user.id)
+            ]
+
+        self.assertEqual(product_counts(), [5, 0])
+        product = Product.objects.get(pk=self.data['products'][0].pk)
+        product.shop = other_shop
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertEqual(product_counts(), [4, 1])
@@ -1,5 +1,5 @@
 from django.urls import path, include
-from shop.views import CreateShopAPIView, ShopViewSet, MyDashboard
+from shop.views import CreateShopAPIView, ShopViewSet, MyDashboard, async_shop_list
 from rest_framework.routers import DefaultRouter
 
 router = DefaultRouter()
@@ -9,4 +9,5 @@ urlpatterns = [
     path('', include(router.urls)),
     path('create/', CreateShopAPIView.as_view(), name='create_shop'),
     path('dashboard/', MyDashboard.as_view(), name='my-dashboard'),
+    path('async/list/', async_shop_list, name='async_shop_list'),
 ]
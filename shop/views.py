@@ -11,22 +11,39 @@ from django.contrib.auth.models import User
 from listing.models import Product, Review
 from order.models import Order
 from django.db import models
+from django.conf import settings
+from JuicyCart_Tropicals.cache import CachedResponseMixin, get_or_compute
+from JuicyCart_Tropicals.mixins import FastListMixin, SparseFieldsMixin
+from JuicyCart_Tropicals.async_views import list_response, throttled
+from django.views.decorators.http import require_GET
+from users.serializers import SellerSerializer
+
+
+def filter_shops(queryset, params):
+    shop_id = params.get('shop_id')
+    user_id = params.get('user_id')
+    if shop_id:
+        queryset = Shop.objects.filter(id=shop_id)
+    if user_id:
+        queryset = Shop.objects.filter(owner=user_id)
+    return queryset
 
 
 class SpecificShop(filters.BaseFilterBackend):
     def filter_queryset(self, request, queryset, view):
-        shop_id = request.query_params.get('shop_id')
-        user_id = request.query_params.get('user_id')
-        if shop_id:
-            queryset = Shop.objects.filter(id=shop_id)
-        if user_id:
-            queryset = Shop.objects.filter(owner=user_id)
-        return queryset
-
-class ShopViewSet(viewsets.ReadOnlyModelViewSet):
+        return filter_shops(queryset, request.query_params)
+
+class ShopViewSet(SparseFieldsMixin, CachedResponseMixin, FastListMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = ShopSerializer
     queryset = Shop.objects.all()
     filter_backends = [SpecificShop]
+    expandable_fields = {'owner': SellerSerializer}
+
+
+@require_GET
+@throttled()
+async def async_shop_list(request):
+    return await list_response(filter_shops(Shop.objects.all(), request.GET), ShopSerializer)
 
 
 class CreateShopAPIView(views.APIView):
@@ -54,6 +71,8 @@ class CreateShopAPIView(views.APIView):
 
 
 class MyDashboard(views.APIView):
+    throttle_scope = 'dashboard'
+
     def post(self, request):
         user_id = request.data.get('user_id')
         user = User.objects.get(id=user_id)
@@ -68,31 +87,49 @@ class MyDashboard(views.APIView):
         except Shop.DoesNotExist:
             raise ValidationError({"error": "Shop does not exist"})
         
-        products = Product.objects.filter(shop=shop)
-        product_count = products.count()
-        reviews = Review.objects.filter(product__shop=shop).count()
-        orders = Order.objects.filter(product__shop=shop)
-        order_count = orders.count()
-
-        # Aggregate values safely
-        available_stock = products.aggregate(total=models.Sum('available'))['total'] or 0
-        total_orders = orders.aggregate(total=models.Sum('quantity'))['total'] or 0
-        total_sold = orders.filter(status='Completed').aggregate(total=models.Sum('quantity'))['total'] or 0
-        total_cancelled = orders.filter(status='Cancelled').aggregate(total=models.Sum('quantity'))['total'] or 0
-        total_pending = orders.filter(status='Pending').aggregate(total=models.Sum('quantity'))['total'] or 0
-        total_earning = orders.filter(status='Completed').aggregate(total=models.Sum('total_price'))['total'] or 0
-
-        # Ensure no NoneType error in calculations
-        engagement_score = ((reviews * 5) + (total_orders * 2) + (product_count * 3) + total_earning) - total_cancelled
-
-        return Response({
-            'product_count': product_count,
-            'reviews': reviews,
-            'total_orders': total_orders,
-            'available_stock': available_stock,
-            'total_sold': total_sold,
-            'total_cancelled': total_cancelled,
-            'total_pending': total_pending,
-            'total_earning': total_earning,
-            'engagement_score': engagement_score
-        })
\ No newline at end of file
+        stats, _ = get_or_compute(
+            f'dashboard:{shop.id}',
+            lambda: (shop_dashboard_stats(shop), [f'shop:{shop.id}:dashboard']),
+            settings.DASHBOARD_CACHE_TIMEOUT,
+        )
+        return Response(stats)
+
+
+def shop_dashboard_stats(shop):
+    # one aggregate per table instead of one query per figure
+    products = Product.objects.filter(shop=shop).aggregate(
+        product_count=models.Count('id'),
+        available_stock=models.Sum('available'),
+    )
+    reviews = Review.objects.filter(product__shop=shop).count()
+    orders = Order.objects.filter(product__shop=shop).aggregate(
+        total_orders=models.Sum('quantity'),
+        total_sold=models.Sum('quantity', filter=models.Q(status='Completed')),
+        total_cancelled=models.Sum('quantity', filter=models.Q(status='Cancelled')),
+        total_pending=models.Sum('quantity', filter=models.Q(status='Pending')),
+        total_earning=models.Sum('total_price', filter=models.Q(status='Completed')),
+    )
+
+    product_count = products['product_count']
+    # Aggregate values safely
+    available_stock = products['available_stock'] or 0
+    total_orders = orders['total_orders'] or 0
+    total_sold = orders['total_sold'] or 0
+    total_cancelled = orders['total_cancelled'] or 0
+    total_pending = orders['total_pending'] or 0
+    total_earning = orders['total_earning'] or 0
+
+    # Ensure no NoneType error in calculations
+    engagement_score = ((reviews * 5) + (total_orders * 2) + (product_count * 3) + total_earning) - total_cancelled
+
+    return {
+        'product_count': product_count,
+        'reviews': reviews,
+        'total_orders': total_orders,
+        'available_stock': available_stock,
+        'total_sold': total_sold,
+        'total_cancelled': total_cancelled,
+        'total_pending': total_pending,
+        'total_earning': total_earning,
+        'engagement_score': engagement_score
+    }
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core import checks
+from django.utils import timezone
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import AllowAny
+
+
+@checks.register(checks.Tags.security)
+def check_token_lifetimes(app_configs, **kwargs):
+    """A token rotated later than it expires would be handed out on login already expired."""
+    if settings.TOKEN_ROTATE_AFTER >= settings.TOKEN_TTL:
+        return [checks.Error(
+            "TOKEN_ROTATE_AFTER must be shorter than TOKEN_TTL, otherwise login returns expired tokens.",
+            hint="Lower TOKEN_ROTATE_AFTER_HOURS or raise TOKEN_TTL_HOURS.",
+            id='users.E001',
+        )]
+    return []
+
+
+def expired_tokens(now=None):
+    cutoff = (now or timezone.now()) - settings.TOKEN_TTL
+    return Token.objects.filter(created__lt=cutoff)
+
+
+def issue_token(user):
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and token.created < timezone.now() - settings.TOKEN_ROTATE_AFTER:
+        # rotate old keys on login so a leaked token has a short useful life
+        Token.objects.filter(key=token.key).delete()
+        token, _ = Token.objects.get_or_create(user=user)
+    return token
+
+
+class TokenExpired(AuthenticationFailed):
+    default_detail = 'Token has expired.'
+
+
+def needs_user(request):
+    """Whether the view of a DRF `request` has a permission an anonymous user could fail."""
+    view = request.parser_context.get('view')
+    return view is not None and not all(isinstance(permission, AllowAny) for permission in view.get_permissions())
+
+
+class ExpiringTokenAuthentication(TokenAuthentication):
+    def authenticate(self, request):
+        try:
+            return super().authenticate(request)
+        except TokenExpired:
+            # a client still sending its old token can log in again or browse, only views needing a user refuse it
+            if needs_user(request):
+                raise
+            return None
+
+    def authenticate_credentials(self, key):
+        user, token = super().authenticate_credentials(key)
+        if token.created < timezone.now() - settings.TOKEN_TTL:
+            token.delete()
+            raise TokenExpired()
+        return (user, token)
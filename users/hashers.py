@@ -0,0 +1,11 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class ConfigurablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    # Django rehashes on a successful login whenever the stored iteration count
+    # differs from this one, so changing PASSWORD_HASH_ITERATIONS migrates
+    # existing users transparently.
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS
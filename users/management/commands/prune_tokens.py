@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+from users.authentication import expired_tokens
+
+
+def token_table_stats():
+    stats = {'rows': Token.objects.count(), 'expired': expired_tokens().count()}
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_total_relation_size(%s)", [Token._meta.db_table])
+            stats['bytes'] = cursor.fetchone()[0]
+    return stats
+
+
+class Command(BaseCommand):
+    help = "Delete expired auth tokens in small batches so the table is never locked for long."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        before = token_table_stats()
+        self.stdout.write(f"before: {before}")
+
+        deleted = batches = 0
+        started = time.monotonic()
+        while options['max_batches'] is None or batches < options['max_batches']:
+            keys = list(expired_tokens().order_by('created').values_list('key', flat=True)[:batch_size])
+            if not keys:
+                break
+            with transaction.atomic():
+                deleted += Token.objects.filter(key__in=keys).delete()[0]
+            batches += 1
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        elapsed = time.monotonic() - started
+
+        rate = deleted / elapsed if elapsed else 0
+        self.stdout.write(f"after: {token_table_stats()}")
+        self.stdout.write(self.style.SUCCESS(
+            f"deleted {deleted} tokens in {batches} batches, {elapsed:.2f}s ({rate:.0f} tokens/s)"
+        ))
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0003_tokenproxy'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        # expiry checks and prune_tokens scan authtoken_token by creation time
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS authtoken_token_created_idx ON authtoken_token (created);',
+            reverse_sql='DROP INDEX IF EXISTS authtoken_token_created_idx;',
+        ),
+    ]
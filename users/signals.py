@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from users.models import Customer, Seller
+from JuicyCart_Tropicals.cache import invalidate_instance
+
+
+@receiver([post_save, post_delete], sender=Seller)
+@receiver([post_save, post_delete], sender=Customer)
+def invalidate_cached_profile(sender, instance, signal, created=False, **kwargs):
+    # also drops the shops, orders and reviews that embed the profile with ?expand=
+    invalidate_instance(instance, membership_changed=created or signal is post_delete)
@@ -1,3 +1,148 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from JuicyCart_Tropicals.testing import QueryBudgetMixin, create_marketplace
+from users.authentication import check_token_lifetimes, issue_token
+
+
+class PrivateView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'user_id': request.user.id})
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace()
+
+    def test_user_list(self):
+        self.assertQueryBudget(1, 'get', '/user/list/')
+
+    def test_seller_list(self):
+        self.assertQueryBudget(1, 'get', '/user/seller/list/')
+
+    def test_customer_list(self):
+        self.assertQueryBudget(1, 'get', '/user/customer/list/', {'user_id': self.data['customer'].user_id})
+
+    def test_batch_lookups(self):
+        seller_id, customer_id = self.data['seller'].user_id, self.data['customer'].user_id
+        for path, ids in [('/user/list/', [seller_id, customer_id]), ('/user/seller/list/', [seller_id]),
+                          ('/user/customer/list/', [customer_id])]:
+            response = self.assertQueryBudget(1, 'get', path, {'ids': ','.join(map(str, ids + [10 ** 6]))})
+            self.assertEqual(sorted(response.json()), sorted(map(str, ids)))
+
+    @override_settings(BATCH_MAX_IDS=2)
+    def test_batch_lookup_limits(self):
+        self.assertEqual(self.client.get('/user/list/', {'ids': '1,2,3'}).status_code, 400)
+        self.assertEqual(self.client.get('/user/list/', {'ids': '1,1,2'}).status_code, 200)
+        response = self.client.get('/user/customer/list/', {'ids': '1,two'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    @override_settings(LOGIN_CREATES_SESSION=False)
+    def test_token_only_login(self):
+        response = self.assertQueryBudget(
+            5, 'post', '/user/login/', {'username': 'customer', 'password': 'customer-password'},
+        )
+        self.assertIn('token', response.json())
+
+
+class TokenTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_marketplace(products=1, orders=0)
+        cls.customer_user = cls.data['customer'].user
+        cls.seller_user = cls.data['seller'].user
+
+    def age(self, token, delta):
+        Token.objects.filter(key=token.key).update(created=timezone.now() - delta)
+
+    def login(self):
+        response = self.client.post('/user/login/', {'username': 'customer', 'password': 'customer-password'})
+        return response.json()['token']
+
+    def test_expired_token_is_rejected(self):
+        token = issue_token(self.customer_user)
+        view = PrivateView.as_view()
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(view(request).status_code, 200)
+
+        self.age(token, settings.TOKEN_TTL + timedelta(minutes=1))
+        response = view(APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}'))
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
+
+    def test_expired_token_is_ignored_where_anyone_is_allowed(self):
+        token = issue_token(self.customer_user)
+        self.age(token, settings.TOKEN_TTL + timedelta(minutes=1))
+        self.assertEqual(self.client.get('/user/list/', HTTP_AUTHORIZATION=f'Token {token.key}').status_code, 200)
+        self.assertFalse(Token.objects.filter(key=token.key).exists())
+
+    def test_login_with_an_expired_token(self):
+        key = self.login()
+        self.age(Token.objects.get(key=key), settings.TOKEN_TTL + timedelta(minutes=1))
+        response = self.client.post(
+            '/user/login/', {'username': 'customer', 'password': 'customer-password'}, HTTP_AUTHORIZATION=f'Token {key}',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['token'], key)
+
+    def test_rotation_must_come_before_expiry(self):
+        self.assertEqual(check_token_lifetimes(None), [])
+        with override_settings(TOKEN_ROTATE_AFTER=settings.TOKEN_TTL):
+            self.assertEqual([error.id for error in check_token_lifetimes(None)], ['users.E001'])
+
+    def test_login_rotates_old_tokens(self):
+        key = self.login()
+        self.assertEqual(self.login(), key)
+
+        self.age(Token.objects.get(key=key), settings.TOKEN_ROTATE_AFTER + timedelta(minutes=1))
+        rotated = self.login()
+        self.assertNotEqual(rotated, key)
+        self.assertEqual(list(Token.objects.filter(user=self.customer_user).values_list('key', flat=True)), [rotated])
+
+    def test_prune_tokens_deletes_only_expired(self):
+        expired, fresh = issue_token(self.customer_user), issue_token(self.seller_user)
+        self.age(expired, settings.TOKEN_TTL + timedelta(minutes=1))
+        self.age(fresh, settings.TOKEN_TTL - timedelta(minutes=1))
+
+        call_command('prune_tokens', '--batch-size', '1', stdout=io.StringIO())
+        self.assertEqual(list(Token.objects.values_list('key', flat=True)), [fresh.key])
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        with override_settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.user = User.objects.create_user('mango', password='mango-password')
+
+    def login(self):
+        return self.client.post('/user/login/', {'username': 'mango', 'password': 'mango-password'})
+
+    def test_login_rehashes_with_new_iterations(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        with override_settings(PASSWORD_HASH_ITERATIONS=1200):
+            self.assertEqual(self.login().status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1200$'))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=1000)
+    def test_session_is_only_created_when_enabled(self):
+        with override_settings(LOGIN_CREATES_SESSION=True):
+            self.assertIn(settings.SESSION_COOKIE_NAME, self.login().cookies)
+        self.client.cookies.clear()
+        with override_settings(LOGIN_CREATES_SESSION=False):
+            response = self.login()
+        self.assertIn('token', response.json())
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
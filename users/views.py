@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect
+from django.conf import settings
 from users.serializers import SellerRegistrationSerializer, CustomerRegistrationSerializer, UserLoginSerializer, UserSerializer, SellerSerializer, CustomerSerializer, UserLogoutSerializer
 from rest_framework import viewsets
 from rest_framework.views import APIView
@@ -10,10 +11,12 @@ from django.core.mail import EmailMultiAlternatives
 from django.contrib.auth.models import User
 from django.template.loader import render_to_string
 from users.models import Customer, Seller
+from users.authentication import issue_token
 from django.contrib.auth import authenticate, login, logout
 from rest_framework.authtoken.models import Token
 from rest_framework import filters
 from rest_framework.permissions import IsAuthenticated
+from JuicyCart_Tropicals.mixins import BatchRetrieveMixin
 
 
 class SpecificUser(filters.BaseFilterBackend):
@@ -23,7 +26,7 @@ class SpecificUser(filters.BaseFilterBackend):
             return queryset.filter(id=uid)
         return queryset
 
-class UserViewSet(viewsets.ReadOnlyModelViewSet):
+class UserViewSet(BatchRetrieveMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     filter_backends = [SpecificUser]
@@ -36,12 +39,12 @@ class SpecificSellerAndCustomer(filters.BaseFilterBackend):
             return queryset.filter(user=uid)
         return queryset
 
-class SellerViewSet(viewsets.ReadOnlyModelViewSet):
+class SellerViewSet(BatchRetrieveMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = SellerSerializer
     queryset = Seller.objects.all()
     filter_backends = [SpecificSellerAndCustomer]
 
-class CustomerViewSet(viewsets.ReadOnlyModelViewSet):
+class CustomerViewSet(BatchRetrieveMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = CustomerSerializer
     queryset = Customer.objects.all()
     filter_backends = [SpecificSellerAndCustomer]
@@ -120,8 +123,9 @@ class UserLoginAPIView(APIView):
 
             user = authenticate(username=username, password=password)
             if user:
-                token, _ = Token.objects.get_or_create(user=user)
-                login(request, user)
+                token = issue_token(user)
+                if settings.LOGIN_CREATES_SESSION:
+                    login(request, user)
                 return Response({'token' : token.key, 'user_id' : user.id})
             else:
                 return Response({'error' : 'Invalid information provided!'})